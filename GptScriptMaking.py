@@ -1,62 +1,111 @@
 import os
+import argparse
 import requests
 import sys
 from dotenv import load_dotenv
+from disk_cache import DiskCache
+from provider_clients import OPENAI_BASE_URL
 
 # Load API key from .env file
 load_dotenv("credentials.env")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-# Ensure the API key is loaded
-if not OPENAI_API_KEY:
-    print("Error: OpenAI API key not found. Please set it in a .env file.")
-    sys.exit(1)
+OPENAI_CHAT_URL = f"{OPENAI_BASE_URL}/v1/chat/completions"
+GPT_MODEL = "gpt-4o"
+GPT_TEMPERATURE = 0.7
+OUTPUT_FILE = "./data/output_gpt.txt"
+
+# Responses are cached by (model, messages, temperature), so identical instructions are answered from disk
+GPT_CACHE_DIR = "./data/gpt_cache"
+GPT_CACHE_MAX_MB = int(os.getenv("GPT_CACHE_MAX_MB", "50"))
+GPT_CACHE_TTL_DAYS = os.getenv("GPT_CACHE_TTL_DAYS")  # Unset: entries never expire
+GPT_CACHE = DiskCache(
+    GPT_CACHE_DIR,
+    max_bytes=GPT_CACHE_MAX_MB * 1024 * 1024,
+    ttl=float(GPT_CACHE_TTL_DAYS) * 86400 if GPT_CACHE_TTL_DAYS else None
+)
 
 def read_instructions(file_path):
     """Reads the instruction file and returns the text."""
     if not os.path.exists(file_path):
         print(f"Error: File '{file_path}' not found.")
         sys.exit(1)
-    
+
     with open(file_path, "r", encoding="utf-8") as file:
         return file.read()
 
-def query_gpt(prompt):
-    """Sends the prompt to OpenAI's GPT API and returns the response."""
-    url = "https://api.openai.com/v1/chat/completions"
+def cached_completion(payload, send, force=False, cache=GPT_CACHE):
+    """Returns the response text for a chat completion payload, calling send(payload) only on a cache miss.
+
+    With force, the cached response is ignored and replaced by a fresh one.
+    """
+    key = cache.make_key(payload["model"], payload["messages"], payload.get("temperature"))
+    if not force:
+        cached = cache.get(key)
+        if cached is not None:
+            print("⚡ Using cached GPT response")
+            return cached.decode("utf-8")
+
+    content = send(payload)
+    cache.put(key, content.encode("utf-8"))
+    return content
+
+def send_to_openai(payload):
+    """Sends a chat completion payload to OpenAI's API and returns the response text."""
+    # Ensure the API key is loaded
+    if not OPENAI_API_KEY:
+        print("Error: OpenAI API key not found. Please set it in a .env file.")
+        sys.exit(1)
+
     headers = {"Authorization": f"Bearer {OPENAI_API_KEY}", "Content-Type": "application/json"}
-    payload = {
-        "model": "gpt-4o",
-        "messages": [
-            {"role": "system", "content": "Follow the user's instructions carefully."},
-            {"role": "user", "content": prompt}
-        ],
-        "temperature": 0.7
-    }
+    response = requests.post(OPENAI_CHAT_URL, headers=headers, json=payload)
 
-    response = requests.post(url, headers=headers, json=payload)
-    
     if response.status_code == 200:
         return response.json()["choices"][0]["message"]["content"]
     else:
         print(f"Error: {response.status_code}, {response.text}")
         sys.exit(1)
 
+def build_payload(prompt):
+    """Returns the chat completion payload for a script prompt."""
+    return {
+        "model": GPT_MODEL,
+        "messages": [
+            {"role": "system", "content": "Follow the user's instructions carefully."},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": GPT_TEMPERATURE
+    }
+
+def query_gpt(prompt, force=False):
+    """Sends the prompt to OpenAI's GPT API and returns the response. Identical prompts are served from the cache."""
+    return cached_completion(build_payload(prompt), send_to_openai, force=force)
+
+def write_if_changed(path, text):
+    """Writes text to path unless the file already has exactly this content, so its mtime stays put. Returns True if written."""
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            if f.read() == text:
+                return False
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(text)
+    return True
+
 if __name__ == "__main__":
-    # Ensure a file path is provided
-    if len(sys.argv) < 2:
-        print("Usage: python gpt.py <instruction_file.txt>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Generates a video script with ChatGPT.")
+    parser.add_argument("instruction_file", help="Text file with the instructions")
+    parser.add_argument("--force", action="store_true", help="Ignore the response cache and regenerate")
+    args = parser.parse_args()
+
+    instructions = read_instructions(args.instruction_file)
 
-    instruction_file = sys.argv[1]
-    instructions = read_instructions(instruction_file)
-    
     print("\n[+] Sending instructions to ChatGPT...\n")
-    response = query_gpt(instructions)
+    response = query_gpt(instructions, force=args.force)
 
     print("\n[GPT Response]:\n")
     print(response)
 
-    with open("./data/output_gpt.txt", "w", encoding="utf-8") as f:
-        f.write(response)
+    if write_if_changed(OUTPUT_FILE, response):
         print("\n[+] Response saved to output_gpt.txt")
+    else:
+        print("\n[+] output_gpt.txt is unchanged")
@@ -1,9 +1,15 @@
 import os
+import sys
+import asyncio
+import argparse
 import requests
-import subprocess
-import time
+from concurrent.futures import ProcessPoolExecutor
 from dotenv import load_dotenv
-from google.cloud import storage
+from object_storage import get_storage
+from concat_video import concatenate_videos
+from crop_region import resolve_region, region_to_circle
+from crop_circular import crop_circular_video
+from crop_square import crop_square_video
 
 # Load API key from .env file
 load_dotenv("./credentials.env")
@@ -11,21 +17,29 @@ api_key = os.getenv("HEYGEN_API_KEY")
 if not api_key:
     raise ValueError("HEYGEN_API_KEY not found in credentials.env")
 
-# Google Cloud Storage setup
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = r"C:\Users\eprot\OneDrive - Hochschule Düsseldorf\Dokumente\Uni\6. Semester (NO)\CV and DL\buoyant-airport-451611-d4-0e7f2929f9e6.json"
-storage_client = storage.Client()
-bucket_name = "mein-uni-bucket-2025"
+# Object storage that upload2google.py uploaded the audio parts to
+object_store = get_storage()
 
 # Publicly accessible URLs (no need for signed URLs anymore)
 video_filenames = ["temp_part1.mp4", "temp_part2.mp4", "temp_part3.mp4"]
-video_urls = [f"https://storage.googleapis.com/{bucket_name}/{filename}" for filename in video_filenames]
+video_urls = [object_store.public_url(filename) for filename in video_filenames]
 video_output_paths = [f"./data/{filename}" for filename in video_filenames]
 final_video_path = "./data/avatar_video.mp4"
+pipelined_output_path = "./data/final_cropped_avatar.mp4"  # Cropped avatar, as consumed by assemble_video.py
 
 # HeyGen avatar settings
 avatar_id = "Dexter_Doctor_Standing2_public"
 background_color = "#000000"  # Black background
 
+# Status polling and download settings
+POLL_INITIAL_DELAY = 5  # Seconds before the first re-check
+POLL_BACKOFF = 1.5  # Delay multiplier after every check
+POLL_MAX_DELAY = 30  # Upper bound for the delay between checks
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+MAX_CONCURRENT_DOWNLOADS = 2
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB
+REQUEST_TIMEOUT = 60  # Seconds
+
 def create_avatar_video(audio_url, video_output_path):
     """ Sends a request to HeyGen API to create an avatar video. """
     print(f"🎥 Requesting HeyGen avatar generation with audio: {audio_url}")
@@ -58,77 +72,184 @@ def create_avatar_video(audio_url, video_output_path):
         print(f"❌ Failed to create video: {response.status_code}, {response.text}")
         return None
 
-def download_video(video_id, video_output_path):
-    """ Checks the status and downloads the generated HeyGen video. """
+def stream_download(video_url, video_output_path):
+    """ Streams a finished video to disk in chunks instead of holding it in memory. """
+    temp_path = f"{video_output_path}.part"
+    with requests.get(video_url, stream=True, timeout=REQUEST_TIMEOUT) as response:
+        response.raise_for_status()
+        with open(temp_path, "wb") as f:
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+    os.replace(temp_path, video_output_path)
+
+async def wait_and_download(session, video_id, video_output_path, download_slots, on_downloaded=None):
+    """ Polls one video's status with adaptive backoff and downloads it as soon as it is completed.
+
+    If given, the on_downloaded coroutine is awaited with the local path right after the download.
+    """
     print(f"⏳ Checking status for video_id: {video_id}")
     status_url = f"https://api.heygen.com/v1/video_status.get?video_id={video_id}"
     headers = {"X-Api-Key": api_key}
+    delay = POLL_INITIAL_DELAY
 
     while True:
-        response = requests.get(status_url, headers=headers)
-        if response.status_code == 200:
+        try:
+            response = await asyncio.to_thread(session.get, status_url, headers=headers, timeout=REQUEST_TIMEOUT)
+        except requests.RequestException as e:
+            print(f"⚠️ Status check for {video_id} failed: {e}")
+            response = None
+
+        if response is not None and response.status_code == 200:
             video_info = response.json()["data"]
             status = video_info["status"]
 
             if status == "completed":
                 video_url = video_info["video_url"]
-                print(f"🎬 Video is ready. Downloading from {video_url}...")
-                video_data = requests.get(video_url).content
-                with open(video_output_path, "wb") as f:
-                    f.write(video_data)
+                async with download_slots:
+                    print(f"🎬 Video {video_id} is ready. Downloading from {video_url}...")
+                    try:
+                        await asyncio.to_thread(stream_download, video_url, video_output_path)
+                    except (requests.RequestException, OSError) as e:
+                        print(f"❌ Download of {video_id} failed: {e}")
+                        return False
                 print(f"✅ Video saved to {video_output_path}")
+                if on_downloaded:
+                    return await on_downloaded(video_output_path)
                 return True
             elif status == "failed":
                 print(f"❌ Video creation failed: {video_info.get('error', 'Unknown error')}")
                 return False
             else:
-                print("⌛ Still processing...")
-                time.sleep(5)
-        else:
+                print(f"⌛ {video_id} still processing ({status}), next check in {delay:.0f}s...")
+        elif response is not None and response.status_code not in RETRYABLE_STATUS:
             print(f"❌ Error checking video status: {response.status_code}, {response.text}")
             return False
 
+        # Back off while the render is running or the API is throttling us
+        await asyncio.sleep(delay)
+        delay = min(delay * POLL_BACKOFF, POLL_MAX_DELAY)
+
+async def download_videos_async(video_ids, on_downloaded=None):
+    """ Watches all submitted videos at once; each one is downloaded as soon as it is finished. """
+    download_slots = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+    with requests.Session() as session:
+        return await asyncio.gather(*(
+            wait_and_download(session, video_id, video_path, download_slots, on_downloaded)
+            for video_id, video_path in video_ids
+        ))
+
+def download_video(video_id, video_output_path):
+    """ Checks the status and downloads the generated HeyGen video. """
+    return asyncio.run(download_videos_async([(video_id, video_output_path)]))[0]
+
 def combine_videos(video_paths, output_path):
     """ Combines multiple video files into one final video. """
     if not all(os.path.exists(path) for path in video_paths):
         print("❌ One or more video files are missing. Aborting merge.")
         return False
 
+    # HeyGen parts share codec, resolution and timebase, so this is normally a stream copy
     print("🔧 Combining video parts with FFmpeg...")
-    command = ['ffmpeg'] + sum([['-i', path] for path in video_paths], []) + [
-        '-filter_complex', f'concat=n={len(video_paths)}:v=1:a=1[outv][outa]',
-        '-map', '[outv]', '-map', '[outa]',
-        '-c:v', 'libx264', '-c:a', 'aac', '-y', output_path
-    ]
-
-    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    if result.returncode == 0:
+    if concatenate_videos(video_paths, output_path):
         print(f"✅ Final video created: {output_path}")
         return True
     else:
-        print(f"❌ FFmpeg error: {result.stderr.decode()}")
+        print("❌ FFmpeg failed to combine the video parts.")
         return False
 
-def process_and_generate():
-    """ Main function to generate and merge avatar videos. """
-    os.makedirs("./data", exist_ok=True)
-
-    # Request HeyGen avatar videos
+def submit_videos():
+    """ Requests one HeyGen avatar video per audio part. Returns (video_id, video_path) pairs. """
     video_ids = []
     for audio_url, video_path in zip(video_urls, video_output_paths):
         video_id = create_avatar_video(audio_url, video_path)
         if video_id:
             video_ids.append((video_id, video_path))
+    return video_ids
 
-    # Download videos
-    for video_id, video_path in video_ids:
-        download_video(video_id, video_path)
+def process_and_generate():
+    """ Main function to generate and merge avatar videos. """
+    os.makedirs("./data", exist_ok=True)
+
+    # Request HeyGen avatar videos
+    video_ids = submit_videos()
+
+    # Poll all videos at once and download each one as soon as it is ready
+    results = asyncio.run(download_videos_async(video_ids))
+    if not all(results):
+        print("❌ One or more avatar videos could not be downloaded.")
 
     # Merge videos
     if video_ids and combine_videos(video_output_paths, final_video_path):
         print("🎉 Avatar video generation completed successfully!")
-    else:
+        return True
+    print("❌ Avatar video generation failed.")
+    return False
+
+def postprocess_part(video_path, output_path, crop, region):
+    """ Worker: crops one downloaded part with the same encoder settings as every other part. """
+    if crop == "circle":
+        center, radius = region_to_circle(region)
+        return crop_circular_video(video_path, output_path, center, radius)
+    return crop_square_video(video_path, output_path, region)
+
+async def process_and_generate_pipelined(crop="square", roi=None, refresh_roi=False, workers=None):
+    """ Pipelined variant: each part is cropped in a worker as soon as it is downloaded,
+    while the other parts are still rendering. The final join is a stream copy. """
+    os.makedirs("./data", exist_ok=True)
+
+    video_ids = submit_videos()
+    if not video_ids:
         print("❌ Avatar video generation failed.")
+        return False
+
+    processed_paths = {path: path.replace(".mp4", "_cropped.mp4") for _, path in video_ids}
+    region = {}
+    region_lock = asyncio.Lock()
+    loop = asyncio.get_running_loop()
+
+    with ProcessPoolExecutor(max_workers=workers or len(video_ids)) as pool:
+        async def on_downloaded(video_path):
+            # The first finished part determines the crop region (from --roi, the cache or detection)
+            async with region_lock:
+                if "value" not in region:
+                    region["value"] = await asyncio.to_thread(
+                        resolve_region, video_path, roi, True, avatar_id, refresh_roi
+                    )
+            if region["value"] is None:
+                print("❌ No crop region available. Pass --roi or check the avatar detection.")
+                return False
 
-# Run the script
-process_and_generate()
+            print(f"✂️ Cropping {video_path} while the remaining parts render...")
+            return await loop.run_in_executor(
+                pool, postprocess_part, video_path, processed_paths[video_path], crop, region["value"]
+            )
+
+        results = await download_videos_async(video_ids, on_downloaded)
+
+    if not all(results):
+        print("❌ Avatar video generation failed.")
+        return False
+
+    # Parts were all cropped with identical settings, so this is a stream copy
+    if combine_videos([processed_paths[path] for _, path in video_ids], pipelined_output_path):
+        print("🎉 Avatar video generation completed successfully!")
+        return True
+    print("❌ Avatar video generation failed.")
+    return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the HeyGen avatar video from the uploaded audio parts.")
+    parser.add_argument("--pipelined", action="store_true",
+                        help="Crop each part as soon as it is downloaded and join the cropped parts")
+    parser.add_argument("--crop", choices=["square", "circle"], default="square", help="Crop shape in pipelined mode")
+    parser.add_argument("--roi", help="Crop region as 'x,y,width,height' or JSON; detected and cached if omitted")
+    parser.add_argument("--refresh-roi", action="store_true", help="Ignore the cached region and detect again")
+    parser.add_argument("--workers", type=int, help="Worker processes for cropping in pipelined mode")
+    args = parser.parse_args()
+
+    if args.pipelined:
+        ok = asyncio.run(process_and_generate_pipelined(args.crop, args.roi, args.refresh_roi, args.workers))
+    else:
+        ok = process_and_generate()
+    if not ok:
+        sys.exit(1)
@@ -1,23 +1,44 @@
 import requests
+import io
 import os
 import re
 import sys
+import time
 import base64
-import subprocess
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 from pydub import AudioSegment
-from google.cloud import storage
+from disk_cache import DiskCache
+from object_storage import get_storage
+from audio_frames import audio_info, concat_audio
+from provider_clients import GOOGLE_TTS_BASE_URL
 
 # Load API key from .env file
 load_dotenv("credentials.env")
 GOOGLE_TTS_API_KEY = os.getenv("GOOGLE_TTS_API_KEY")
 MAX_TTS_CHUNK_SIZE = 5000  # Google TTS API limit
-
-# Set Google Cloud credentials
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = r"C:\Users\eprot\OneDrive - Hochschule Düsseldorf\Dokumente\Uni\6. Semester (NO)\CV and DL\buoyant-airport-451611-d4-0e7f2929f9e6.json"
-storage_client = storage.Client()
-bucket_name = "mein-uni-bucket-2025"
-bucket = storage_client.get_bucket(bucket_name)
+TTS_URL = f"{GOOGLE_TTS_BASE_URL}/v1/text:synthesize"
+LANGUAGE_CODE = "en-GB"
+CONTENT_TYPES = {"MP3": "audio/mpeg", "OGG_OPUS": "audio/ogg"}
+
+# Chunk boundaries for split_text, matched on the UTF-8 encoded script
+SENTENCE_END = re.compile(rb"[.!?]+[\"')\]]*(?=\s|$)|\n")
+PARAGRAPH_END = re.compile(rb"\n\s*\n")
+WHITESPACE = b" \t\r\n"
+
+# Concurrent synthesis settings
+DEFAULT_CONCURRENCY = 4  # Chunks synthesized in parallel
+MAX_RETRIES = 3  # Attempts per chunk before giving up
+RETRY_BACKOFF = 1.0  # Seconds before the first retry, doubled on every attempt
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+REQUEST_TIMEOUT = 60  # Seconds
+
+# Synthesized chunks are cached by (text, voice, language, speaking rate, encoding)
+TTS_CACHE_DIR = "./data/tts_cache"
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "200"))
+TTS_CACHE = DiskCache(TTS_CACHE_DIR, max_bytes=TTS_CACHE_MAX_MB * 1024 * 1024)
 
 def read_text_file(file_path):
     """Reads and filters spoken text from the input file."""
@@ -34,136 +55,260 @@ def filter_spoken_text(text):
     """Removes non-spoken content enclosed in (( ... ))."""
     return re.sub(r"\(\(.*?\)\)", "", text).strip()
 
-def split_text(text, max_size=MAX_TTS_CHUNK_SIZE):
-    """Splits text into chunks of max_size bytes."""
+def split_text(text, max_size=MAX_TTS_CHUNK_SIZE, balance=False):
+    """Splits text into chunks of at most max_size UTF-8 bytes at sentence or paragraph boundaries.
+
+    Works in one pass over the encoded text. Chunks are packed close to max_size, or,
+    with balance=True, evened out so parallel synthesis requests take similar time.
+    """
+    data = text.encode("utf-8")
+    total = len(data)
+    if total <= max_size:
+        return [text]
+
+    # Byte offsets just after each sentence end / newline. These delimiters are ASCII,
+    # so a cut there can never land inside a multibyte character.
+    sentence_ends = [m.end() for m in SENTENCE_END.finditer(data)]
+    paragraph_ends = [m.end() for m in PARAGRAPH_END.finditer(data)]
+
+    target, count = max_size, 0
+    if balance:
+        count = len(pack_chunks(data, sentence_ends, paragraph_ends, max_size, max_size, 0))
+        target = -(-total // count)  # ceil
+
+    chunks = pack_chunks(data, sentence_ends, paragraph_ends, target, max_size, count)
+    return [chunk.decode("utf-8").strip() for chunk in chunks if chunk.strip()]
+
+def pack_chunks(data, sentence_ends, paragraph_ends, target, max_size, count):
+    """Cuts data into byte chunks of about target bytes (never more than max_size).
+
+    Both boundary lists are sorted and are consumed with forward-only cursors, so the
+    whole pass is linear in the length of the text.
+    """
+    total = len(data)
     chunks = []
-    while len(text.encode("utf-8")) > max_size:
-        split_index = text.rfind(".", 0, max_size)
-        if split_index == -1:
-            split_index = max_size  # If no period is found, force split
-        chunks.append(text[:split_index + 1])
-        text = text[split_index + 1:].lstrip()
-    chunks.append(text)
+    start = 0
+    s = p = 0  # Cursors into sentence_ends / paragraph_ends
+
+    while total - start > max_size or (len(chunks) < count - 1 and total - start > target):
+        limit = start + target
+        while s < len(sentence_ends) and sentence_ends[s] <= limit:
+            s += 1
+        while p < len(paragraph_ends) and paragraph_ends[p] <= limit:
+            p += 1
+
+        cut = None
+        # Prefer a paragraph break if it does not waste more than a fifth of the chunk
+        # (not when balancing, where chunk sizes matter more than where they end)
+        if not count and p and paragraph_ends[p - 1] > start + target * 4 // 5:
+            cut = paragraph_ends[p - 1]
+        elif s and sentence_ends[s - 1] > start:
+            cut = sentence_ends[s - 1]
+            # When balancing, the first boundary past the target may be closer to it
+            if s < len(sentence_ends) and sentence_ends[s] <= start + max_size \
+                    and sentence_ends[s] - limit < limit - cut:
+                cut = sentence_ends[s]
+        else:
+            # A single sentence longer than the limit: split at the last space,
+            # or force a split on a UTF-8 character boundary
+            cut = data.rfind(b" ", start + 1, limit)
+            if cut <= start:
+                cut = limit
+                while data[cut] & 0xC0 == 0x80:
+                    cut -= 1
+
+        chunks.append(data[start:cut])
+        start = cut
+        while start < total and data[start] in WHITESPACE:
+            start += 1
+
+    chunks.append(data[start:])
     return chunks
 
-def generate_speech(text_chunks, voice="en-GB-Standard-D", speed=1.0, format="MP3"):
-    """Generates speech for text chunks using Google TTS API and saves audio files."""
-    url = f"https://texttospeech.googleapis.com/v1/text:synthesize?key={GOOGLE_TTS_API_KEY}"
-    headers = {"Content-Type": "application/json"}
-    audio_files = []
-
-    for i, chunk in enumerate(text_chunks):
-        data = {
-            "input": {"text": chunk},
-            "voice": {"languageCode": "en-GB", "name": voice, "ssmlGender": "MALE"},
-            "audioConfig": {"audioEncoding": format, "speakingRate": speed}
-        }
+def create_session(pool_size=DEFAULT_CONCURRENCY):
+    """Creates a requests session whose connection pool can serve pool_size concurrent requests."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Content-Type": "application/json"})
+    return session
+
+def request_chunk_audio(session, i, chunk, voice="en-GB-Standard-D", speed=1.0, format="MP3"):
+    """Calls the TTS API for a single chunk, retrying transient failures.
+
+    Returns the decoded audio bytes, or None if the chunk could not be synthesized.
+    """
+    url = f"{TTS_URL}?key={GOOGLE_TTS_API_KEY}"
+    data = {
+        "input": {"text": chunk},
+        "voice": {"languageCode": LANGUAGE_CODE, "name": voice, "ssmlGender": "MALE"},
+        "audioConfig": {"audioEncoding": format, "speakingRate": speed}
+    }
+
+    for attempt in range(1, MAX_RETRIES + 1):
+        delay = RETRY_BACKOFF * 2 ** (attempt - 1)
+        try:
+            response = session.post(url, json=data, timeout=REQUEST_TIMEOUT)
+        except requests.RequestException as e:
+            print(f"⚠️ Chunk {i} attempt {attempt}/{MAX_RETRIES} failed: {e}")
+            if attempt < MAX_RETRIES:
+                time.sleep(delay)
+            continue
 
-        response = requests.post(url, headers=headers, json=data)
         print(f"🔍 API Response {i}: {response.status_code}")
 
         if response.status_code == 200:
-            response_json = response.json()
-            audio_content = response_json.get("audioContent")
+            audio_content = response.json().get("audioContent")
 
             if not audio_content:
                 print(f"❌ Error: No audio content received for chunk {i}")
-                continue
+                return None
 
             try:
-                decoded_audio = base64.b64decode(audio_content, validate=True)
-                file_ext = "ogg" if format == "OGG_OPUS" else "mp3"
-                file_name = f"output_part_{i}.{file_ext}"
-
-                with open(file_name, "wb") as f:
-                    f.write(decoded_audio)
-
-                print(f"✅ Chunk {i} saved as {file_name}")
-                audio_files.append(file_name)
-
-                # Test if chunk is valid
-                validate_audio_file(file_name)
-
+                return base64.b64decode(audio_content, validate=True)
             except Exception as e:
                 print(f"❌ Base64 decoding error for chunk {i}: {e}")
-                continue
+                return None
+
+        elif response.status_code in RETRYABLE_STATUS:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            if attempt == MAX_RETRIES:
+                print(f"⚠️ Chunk {i} attempt {attempt}/{MAX_RETRIES} got {response.status_code}")
+                break
+            print(f"⚠️ Chunk {i} attempt {attempt}/{MAX_RETRIES} got {response.status_code}, retrying in {delay:.1f}s")
+            time.sleep(delay)
 
         else:
             print(f"❌ API Error {i}: {response.text}")
-            return
+            return None
 
-    return merge_audio_files(audio_files, format)
+    print(f"❌ Chunk {i} failed after {MAX_RETRIES} attempts")
+    return None
 
-def merge_audio_files(audio_files, format):
-    """Merges multiple MP3 files into one using ffmpeg and uploads to GCS."""
-    output_file = f"./data/output.{format.lower()}"
-    output_blob_name = f"tts_output.{format.lower()}"  # Name in GCS
+def synthesize_chunk(session, i, chunk, voice="en-GB-Standard-D", speed=1.0, format="MP3", cache=None):
+    """Synthesizes a single chunk, using the cache when possible.
 
-    if not audio_files:
-        print("❌ No valid audio files to merge.")
-        return None
+    Returns the audio bytes, or None if the chunk could not be synthesized or is invalid.
+    """
+    key = DiskCache.make_key(chunk, voice, LANGUAGE_CODE, speed, format)
+    decoded_audio = cache.get(key) if cache else None
 
-    # Check if all chunk files exist before merging
-    for file in audio_files:
-        if not os.path.exists(file):
-            print(f"❌ Missing chunk file: {file}. Merging will fail.")
+    if decoded_audio is not None:
+        print(f"⚡ Chunk {i} served from cache")
+    else:
+        decoded_audio = request_chunk_audio(session, i, chunk, voice, speed, format)
+        if decoded_audio is None:
             return None
 
-    concat_list = "./data/concat_list.txt"
-    with open(concat_list, "w", encoding="utf-8") as f:
-        for file in audio_files:
-            absolute_path = os.path.abspath(file)
-            print(f"✅ Adding file: {absolute_path}")
-            f.write(f"file '{absolute_path}'\n")
+    # Test if chunk is valid
+    if not validate_audio_bytes(decoded_audio, format, f"Chunk {i}"):
+        return None
 
-    command = [
-        "ffmpeg", "-f", "concat", "-safe", "0",
-        "-i", concat_list, "-c", "copy", output_file, "-y"
-    ]
+    if cache:
+        cache.put(key, decoded_audio)
+    return decoded_audio
 
-    print("🔄 Merging files using ffmpeg...")
-    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+def generate_speech(text_chunks, voice="en-GB-Standard-D", speed=1.0, format="MP3", concurrency=DEFAULT_CONCURRENCY,
+                    cache=TTS_CACHE):
+    """Generates speech for text chunks using Google TTS API, merges it and uploads the result.
 
-    if result.returncode == 0:
-        print(f"✅ Successfully merged into {output_file}")
-    else:
-        print(f"❌ ffmpeg merge failed. Falling back to pydub.\nError: {result.stderr.decode()}")
-        merge_audio_files_pydub(audio_files, output_file)
-        if not os.path.exists(output_file):
+    Up to `concurrency` chunks are synthesized in parallel over one pooled session;
+    the results are merged in the original chunk order. Chunks found in the cache
+    are not sent to the API. Chunk audio stays in memory.
+    """
+    session = create_session(concurrency)
+
+    with session, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        audio_chunks = list(pool.map(
+            lambda job: synthesize_chunk(session, job[0], job[1], voice, speed, format, cache),
+            enumerate(text_chunks)
+        ))
+
+    if cache:
+        cache.report("TTS cache")
+
+    failed = [i for i, audio in enumerate(audio_chunks) if audio is None]
+    if failed:
+        print(f"❌ Chunks {failed} could not be synthesized. Aborting merge.")
+        return None
+
+    return merge_audio_files(audio_chunks, format)
+
+def merge_audio_files(audio_chunks, format):
+    """Merges in-memory audio chunks at frame level and uploads the result to object storage.
+
+    The merged audio is also written once to ./data/output.<ext> for upload2google.py.
+    """
+    file_ext = "ogg" if format == "OGG_OPUS" else "mp3"
+    output_file = f"./data/output.{file_ext}"
+    output_blob_name = f"tts_output.{file_ext}"  # Name in GCS
+
+    if not audio_chunks:
+        print("❌ No valid audio chunks to merge.")
+        return None
+
+    print(f"🔄 Merging {len(audio_chunks)} chunks in memory...")
+    try:
+        merged_audio = concat_audio(audio_chunks, format)
+        print(f"✅ Successfully merged {len(merged_audio)} bytes")
+    except ValueError as e:
+        print(f"❌ Frame-level merge failed. Falling back to pydub.\nError: {e}")
+        merged_audio = merge_audio_files_pydub(audio_chunks, format)
+        if merged_audio is None:
             return None
 
-    # Upload to Google Cloud Storage
-    blob = bucket.blob(output_blob_name)
-    blob.upload_from_filename(output_file)
-    print(f"✅ Uploaded {output_file} to GCS as {output_blob_name}")
-    blob.make_public()  # Make it publicly accessible for HeyGen
-    public_url = blob.public_url
-    print(f"📎 Public URL: {public_url}")
-
-    # Cleanup
-    os.remove(concat_list)
-    for file in audio_files:
-        os.remove(file)
-    if os.path.exists(output_file):
-        os.remove(output_file)
+    validate_audio_bytes(merged_audio, format, "Merged audio")
+
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    with open(output_file, "wb") as f:
+        f.write(merged_audio)
+
+    # Upload straight from memory; skipped if the stored object already has this content
+    public_url = get_storage().upload_bytes(merged_audio, output_blob_name, CONTENT_TYPES[format], public=True)
+    print(f"✅ Uploaded merged audio as {output_blob_name}")
 
     return public_url
 
-def merge_audio_files_pydub(audio_files, output_file):
-    """Fallback merging using pydub if ffmpeg fails."""
-    print("🔄 Merging files using pydub...")
+def merge_audio_files_pydub(audio_chunks, format):
+    """Fallback merging using pydub if the frame-level merge fails. Returns the merged bytes."""
+    print("🔄 Merging chunks using pydub...")
+    input_format = "ogg" if format == "OGG_OPUS" else "mp3"
     combined = AudioSegment.empty()
     pause = AudioSegment.silent(duration=500)  # 0.5-second pause between parts
 
-    for file in audio_files:
-        if os.path.exists(file):
-            combined += AudioSegment.from_file(file, format="mp3") + pause
-            os.remove(file)
+    try:
+        for audio in audio_chunks:
+            combined += AudioSegment.from_file(io.BytesIO(audio), format=input_format) + pause
+
+        output = io.BytesIO()
+        if format == "OGG_OPUS":
+            combined.export(output, format="ogg", codec="libopus")
         else:
-            print(f"❌ Skipping missing file: {file}")
+            combined.export(output, format="mp3")
+    except Exception as e:
+        print(f"❌ pydub merge failed: {e}")
+        return None
+
+    print("✅ Successfully merged using pydub.")
+    return output.getvalue()
 
-    combined.export(output_file, format="mp3")
-    print(f"✅ Successfully merged using pydub. File saved as {output_file}")
+def validate_audio_bytes(audio, format="MP3", label="Audio"):
+    """Checks that MP3 or OGG bytes are well-formed by walking frame/page headers, without decoding."""
+    if not audio:
+        print(f"❌ {label}: the audio is empty.")
+        return False
+
+    info = audio_info(audio, format)
+    if info is None:
+        print(f"❌ {label}: invalid {format} data ({len(audio)} bytes)")
+        return False
+
+    frames, duration = info
+    print(f"✅ {label} is valid! {len(audio)} bytes, {frames} frames, duration: {duration:.2f} seconds")
+    return True
 
 def validate_audio_file(file_path):
     """Checks if the MP3 or OGG file is valid and playable."""
@@ -171,36 +316,36 @@ def validate_audio_file(file_path):
         print(f"❌ Error: File '{file_path}' not found.")
         return
 
-    file_size = os.path.getsize(file_path)
-    print(f"📂 File Size: {file_size} bytes")
+    with open(file_path, "rb") as f:
+        audio = f.read()
 
-    if file_size == 0:
-        print("❌ The audio file is empty.")
-        return
-
-    try:
-        audio = AudioSegment.from_file(file_path)
-        print(f"✅ Audio file is valid! Duration: {len(audio) / 1000:.2f} seconds")
-    except Exception as e:
-        print(f"❌ Invalid audio file: {e}")
+    format = "OGG_OPUS" if file_path.lower().endswith(".ogg") else "MP3"
+    validate_audio_bytes(audio, format, file_path)
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("❌ Usage: python google_tts_fixed.py <path_to_text_file> [MP3 or OGG_OPUS]")
+    parser = argparse.ArgumentParser(description="Synthesize a script with Google TTS and upload the result.")
+    parser.add_argument("file_path", help="Path to the script text file")
+    parser.add_argument("format", nargs="?", default="MP3", choices=["MP3", "OGG_OPUS"])
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Maximum number of chunks synthesized in parallel")
+    parser.add_argument("--no-cache", action="store_true", help="Always call the API, bypassing the chunk cache")
+    args = parser.parse_args()
+
+    format = args.format
+
+    text_content = read_text_file(args.file_path)
+    if not text_content:
+        print("❌ The script has no spoken text.")
         sys.exit(1)
 
-    file_path = sys.argv[1]
-    format = sys.argv[2] if len(sys.argv) > 2 else "MP3"  # Default to MP3
-
-    text_content = read_text_file(file_path)
+    text_chunks = split_text(text_content, balance=args.concurrency > 1)
+    public_url = generate_speech(text_chunks, format=format, concurrency=args.concurrency,
+                                 cache=None if args.no_cache else TTS_CACHE)
+    if public_url:
+        print(f"🎉 Final audio URL: {public_url}")
+    else:
+        print("❌ Failed to generate or upload audio.")
+        sys.exit(1)
 
-    if text_content:
-        text_chunks = split_text(text_content)
-        public_url = generate_speech(text_chunks, format=format)
-        if public_url:
-            print(f"🎉 Final audio URL: {public_url}")
-        else:
-            print("❌ Failed to generate or upload audio.")
-    
-    # Validate output file (optional, since it's uploaded and removed locally)
-    # validate_audio_file(f"./data/output.{format.lower()}")
\ No newline at end of file
+    # Validate output file (optional, the merged audio is already checked before upload)
+    # validate_audio_file(f"./data/output.{'ogg' if format == 'OGG_OPUS' else 'mp3'}")
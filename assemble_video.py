@@ -1,39 +1,140 @@
-import subprocess
 import os
+import sys
+import slide2vid
+from ffmpeg_runner import run_ffmpeg, x264_args
 
 # Paths
 SLIDES_VIDEO = "./data/final_slides_video.mp4"
 AVATAR_VIDEO = "./data/final_cropped_avatar.mp4"
 OUTPUT_VIDEO = "./data/final_combined_video.mp4"
+COMPOSITE_LIST_FILE = "./data/slides_images/composite_list.txt"
 
 # Avatar Overlay Settings
 AVATAR_WIDTH = 800  # Doubled the width
 AVATAR_HEIGHT = 490  # Kept the same height
 X_POS = "5"  # Position from left (pixels)
 Y_POS = "5"  # Slightly higher position from the top
+DURATION = 367  # Avatar disappears and output is trimmed after this many seconds
 
-# FFmpeg command to overlay avatar and control duration
-ffmpeg_cmd = [
-    "ffmpeg",
-    "-i", SLIDES_VIDEO,  # Input: Slides video
-    "-i", AVATAR_VIDEO,  # Input: Avatar video
-    "-filter_complex",
-    f"[1:v]scale={AVATAR_WIDTH}:{AVATAR_HEIGHT}[avatar];"
-    f"[0:v][avatar] overlay={X_POS}:{Y_POS}:enable='lte(t,367)' [outv]",  # Avatar disappears after 367s
-    "-map", "[outv]",  # Use the overlayed video
-    "-map", "1:a",  # Use avatar's audio
-    "-t", "367",  # Trim audio to match avatar duration
-    "-c:v", "libx264",  # Video codec
-    "-c:a", "aac",  # Audio codec
-    "-y", OUTPUT_VIDEO  # Overwrite output file
-]
-
-# Run FFmpeg
-print(f"🎬 Combining avatar and slides into {OUTPUT_VIDEO}...")
-result = subprocess.run(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-# Check for errors
-if result.returncode == 0:
-    print(f"✅ Successfully created video: {OUTPUT_VIDEO}")
-else:
-    print(f"❌ FFmpeg error:\n{result.stderr.decode()}")
+# One-pass compositor settings
+OUTPUT_WIDTH = slide2vid.VIDEO_WIDTH  # Frame size of the composited video, the size slides are rendered at
+OUTPUT_HEIGHT = slide2vid.VIDEO_HEIGHT
+FPS = 30
+
+
+def assemble_video(slides_video=SLIDES_VIDEO, avatar_video=AVATAR_VIDEO, output_video=OUTPUT_VIDEO):
+    """Overlays the avatar video on an already encoded slides video."""
+    # FFmpeg command to overlay avatar and control duration
+    ffmpeg_cmd = [
+        "-i", slides_video,  # Input: Slides video
+        "-i", avatar_video,  # Input: Avatar video
+        "-filter_complex",
+        f"[0:v]fps={FPS}[slides];"  # Slides may be encoded at a low frame rate; match the avatar's
+        f"[1:v]scale={AVATAR_WIDTH}:{AVATAR_HEIGHT}[avatar];"
+        f"[slides][avatar] overlay={X_POS}:{Y_POS}:enable='lte(t,{DURATION})' [outv]",  # Avatar disappears after DURATION
+        "-map", "[outv]",  # Use the overlayed video
+        "-map", "1:a",  # Use avatar's audio
+        "-t", str(DURATION),  # Trim audio to match avatar duration
+        *x264_args(),  # Video codec with the configured speed/quality preset
+        "-c:a", "aac",  # Audio codec
+        "-y", output_video  # Overwrite output file
+    ]
+
+    print(f"🎬 Combining avatar and slides into {output_video}...")
+    result = run_ffmpeg(ffmpeg_cmd, label="assemble overlay")
+
+    if result.ok:
+        print(f"✅ Successfully created video: {output_video}")
+        return True
+    else:
+        print(f"❌ FFmpeg error:\n{result.stderr}")
+        return False
+
+
+def write_composite_list(image_files, durations, list_file=COMPOSITE_LIST_FILE):
+    """Writes an FFmpeg concat list that shows each slide image for its duration."""
+    os.makedirs(os.path.dirname(list_file), exist_ok=True)
+    with open(list_file, "w", encoding="utf-8") as f:
+        for img, duration in zip(image_files, durations):
+            f.write(f"file '{os.path.abspath(img).replace(os.sep, '/')}'\n")
+            f.write(f"duration {duration:.2f}\n")
+        # The concat demuxer ignores the last duration unless the file is repeated
+        f.write(f"file '{os.path.abspath(image_files[-1]).replace(os.sep, '/')}'\n")
+    return list_file
+
+
+def build_composite_graph(x_pos=X_POS, y_pos=Y_POS, avatar_width=AVATAR_WIDTH, avatar_height=AVATAR_HEIGHT,
+                          width=OUTPUT_WIDTH, height=OUTPUT_HEIGHT, fps=FPS, duration=DURATION):
+    """Builds the filter graph that renders the slides and overlays the avatar in one pass."""
+    return (
+        # Fit every slide into the output frame, letterboxing if the aspect ratio differs
+        f"[0:v]scale={width}:{height}:force_original_aspect_ratio=decrease,"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={fps},format=yuv420p[slides];"
+        f"[1:v]scale={avatar_width}:{avatar_height}[avatar];"
+        f"[slides][avatar]overlay={x_pos}:{y_pos}:enable='lte(t,{duration})':eof_action=pass,"
+        f"format=yuv420p[outv]"
+    )
+
+
+def compose_video(image_files, durations, avatar_video=AVATAR_VIDEO, output_video=OUTPUT_VIDEO,
+                  audio_source=None, x_pos=X_POS, y_pos=Y_POS, avatar_width=AVATAR_WIDTH,
+                  avatar_height=AVATAR_HEIGHT, duration=None):
+    """Renders slide images and the avatar overlay into the final video with a single encode.
+
+    Replaces the slide2vid -> assemble_video chain, which encodes the full timeline twice.
+    """
+    if len(image_files) != len(durations):
+        print(f"❌ ERROR: Got {len(image_files)} slides but {len(durations)} durations.")
+        return False
+
+    for path in list(image_files) + [avatar_video]:
+        if not os.path.exists(path):
+            print(f"❌ Input file {path} not found!")
+            return False
+
+    if duration is None:
+        duration = min(sum(durations), DURATION)
+
+    list_file = write_composite_list(image_files, durations)
+
+    command = [
+        "-f", "concat", "-safe", "0", "-i", list_file,  # Input 0: slide images with durations
+        "-i", avatar_video,  # Input 1: avatar video
+    ]
+    audio_map = "1:a"
+    if audio_source and os.path.abspath(audio_source) != os.path.abspath(avatar_video):
+        command += ["-i", audio_source]  # Input 2: separate audio track
+        audio_map = "2:a"
+
+    command += [
+        "-filter_complex", build_composite_graph(x_pos, y_pos, avatar_width, avatar_height, duration=duration),
+        "-map", "[outv]",
+        "-map", audio_map,
+        "-t", str(duration),
+        *x264_args(),
+        "-c:a", "aac",
+        "-movflags", "+faststart",
+        "-y", output_video
+    ]
+
+    print(f"🎬 Compositing {len(image_files)} slides and avatar into {output_video} in one pass...")
+    result = run_ffmpeg(command, label="one-pass composite")
+
+    if result.ok:
+        print(f"✅ Successfully created video: {output_video}")
+        return True
+    else:
+        print(f"❌ FFmpeg error:\n{result.stderr}")
+        return False
+
+
+if __name__ == "__main__":
+    if "--one-pass" in sys.argv:
+        # Render slides and avatar in a single FFmpeg graph instead of two full encodes
+        os.makedirs(slide2vid.IMAGES_DIR, exist_ok=True)
+        image_files = slide2vid.convert_slides_to_images()
+        ok = bool(image_files) and compose_video(image_files, slide2vid.load_slide_durations())
+    else:
+        ok = assemble_video()
+    if not ok:
+        sys.exit(1)
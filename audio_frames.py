@@ -0,0 +1,190 @@
+import struct
+
+# Frame-level inspection and concatenation of in-memory MP3 and Ogg audio.
+# Only frame/page headers are parsed; no audio is decoded.
+
+# MPEG audio header tables, indexed by the header's version / layer / bitrate / sample rate bits
+MPEG_VERSIONS = {0: 2.5, 2: 2, 3: 1}
+MPEG_LAYERS = {1: 3, 2: 2, 3: 1}
+MPEG_SAMPLE_RATES = {1: (44100, 48000, 32000), 2: (22050, 24000, 16000), 2.5: (11025, 12000, 8000)}
+MPEG_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+OGG_CAPTURE = b"OggS"
+OPUS_SAMPLE_RATE = 48000  # Opus granule positions always count 48 kHz samples
+
+def _ogg_crc_table():
+    table = []
+    for i in range(256):
+        crc = i << 24
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x04C11DB7) if crc & 0x80000000 else (crc << 1)
+        table.append(crc & 0xFFFFFFFF)
+    return table
+
+OGG_CRC_TABLE = _ogg_crc_table()
+
+def skip_id3v2(data, offset=0):
+    """Returns the offset just past an ID3v2 tag at offset, or offset if there is none."""
+    if data[offset:offset + 3] != b"ID3" or len(data) < offset + 10:
+        return offset
+    size = 0
+    for byte in data[offset + 6:offset + 10]:
+        size = (size << 7) | (byte & 0x7F)  # Syncsafe integer
+    footer = 10 if data[offset + 5] & 0x10 else 0
+    return offset + 10 + size + footer
+
+def parse_mp3_header(data, offset):
+    """Parses the MPEG audio frame header at offset.
+
+    Returns (frame_length, samples_per_frame, sample_rate) or None if there is no valid header.
+    """
+    if offset + 4 > len(data):
+        return None
+    b1, b2 = data[offset + 1], data[offset + 2]
+    if data[offset] != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+
+    version = MPEG_VERSIONS.get((b1 >> 3) & 0x03)
+    layer = MPEG_LAYERS.get((b1 >> 1) & 0x03)
+    bitrate_index = (b2 >> 4) & 0x0F
+    sample_rate_index = (b2 >> 2) & 0x03
+    if version is None or layer is None or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    bitrate = MPEG_BITRATES[(1 if version == 1 else 2, layer)][bitrate_index] * 1000
+    sample_rate = MPEG_SAMPLE_RATES[version][sample_rate_index]
+    padding = (b2 >> 1) & 0x01
+
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate
+    samples = 1152 if layer == 2 or version == 1 else 576
+    return samples // 8 * bitrate // sample_rate + padding, samples, sample_rate
+
+def _is_info_frame(data, offset, frame_length):
+    """True for a Xing/Info/VBRI metadata frame, which carries no audio."""
+    frame = data[offset:offset + min(frame_length, 64)]
+    return b"Xing" in frame or b"Info" in frame or b"VBRI" in frame
+
+def scan_mp3(data):
+    """Walks the MP3 frames in data.
+
+    Returns (audio_start, audio_end, frame_count, duration_seconds) or None if no frames are found.
+    A leading ID3v2 tag, a Xing/Info frame and a trailing ID3v1 tag are excluded from the range.
+    """
+    offset = skip_id3v2(data)
+    header = parse_mp3_header(data, offset)
+    if header is None:
+        return None
+
+    if _is_info_frame(data, offset, header[0]):
+        offset += header[0]
+
+    start = offset
+    frames = 0
+    duration = 0.0
+    while True:
+        header = parse_mp3_header(data, offset)
+        if header is None or offset + header[0] > len(data):
+            break
+        frame_length, samples, sample_rate = header
+        frames += 1
+        duration += samples / sample_rate
+        offset += frame_length
+
+    if frames == 0:
+        return None
+    return start, offset, frames, duration
+
+def ogg_pages(data):
+    """Yields (offset, length, header_type, granule_position, serial) for every Ogg page in data."""
+    offset = 0
+    while offset + 27 <= len(data):
+        if data[offset:offset + 4] != OGG_CAPTURE:
+            raise ValueError(f"Lost Ogg page sync at byte {offset}")
+        header_type = data[offset + 5]
+        granule, serial = struct.unpack_from("<qI", data, offset + 6)
+        segments = data[offset + 26]
+        length = 27 + segments + sum(data[offset + 27:offset + 27 + segments])
+        if offset + length > len(data):
+            raise ValueError(f"Truncated Ogg page at byte {offset}")
+        yield offset, length, header_type, granule, serial
+        offset += length
+
+def scan_ogg(data):
+    """Returns (page_count, duration_seconds) for an Ogg Opus stream, or None if it is not valid Ogg.
+
+    Chained streams are supported; the duration is summed over all links.
+    """
+    try:
+        pages = list(ogg_pages(data))
+    except ValueError:
+        return None
+    if not pages:
+        return None
+
+    pre_skip = {}
+    last_granule = {}
+    for offset, _, header_type, granule, serial in pages:
+        if header_type & 0x02:
+            # Beginning of a link: OpusHead carries the pre-skip in bytes 10-11 of the first packet
+            segments = data[offset + 26]
+            packet = data[offset + 27 + segments:offset + 27 + segments + 19]
+            pre_skip[serial] = struct.unpack_from("<H", packet, 10)[0] if packet.startswith(b"OpusHead") else 0
+        if granule >= 0:
+            last_granule[serial] = max(last_granule.get(serial, 0), granule)
+
+    samples = sum(max(0, granule - pre_skip.get(serial, 0)) for serial, granule in last_granule.items())
+    return len(pages), samples / OPUS_SAMPLE_RATE
+
+def ogg_crc(page):
+    crc = 0
+    for byte in page:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ OGG_CRC_TABLE[((crc >> 24) & 0xFF) ^ byte]
+    return crc
+
+def concat_mp3(chunks):
+    """Joins MP3 byte strings at frame level, dropping per-chunk tags and Xing/Info frames."""
+    parts = []
+    for i, data in enumerate(chunks):
+        info = scan_mp3(data)
+        if info is None:
+            raise ValueError(f"Chunk {i} contains no MP3 frames")
+        start, end, _, _ = info
+        parts.append(memoryview(data)[start:end])
+    return b"".join(parts)
+
+def concat_ogg(chunks):
+    """Joins Ogg streams into one chained Ogg stream.
+
+    Each chunk keeps its own headers (a chained link, as allowed by RFC 3533) but gets
+    a unique serial number, and the affected page checksums are recomputed.
+    """
+    output = bytearray()
+    for i, data in enumerate(chunks):
+        for offset, length, _, _, _ in ogg_pages(data):
+            page = bytearray(data[offset:offset + length])
+            struct.pack_into("<I", page, 14, i + 1)  # Serial number
+            struct.pack_into("<I", page, 22, 0)  # CRC is computed with this field zeroed
+            struct.pack_into("<I", page, 22, ogg_crc(page))
+            output += page
+    return bytes(output)
+
+def audio_info(data, format="MP3"):
+    """Returns (frame_or_page_count, duration_seconds) from headers only, or None if data is not valid."""
+    if format == "OGG_OPUS":
+        return scan_ogg(data)
+    info = scan_mp3(data)
+    return (info[2], info[3]) if info else None
+
+def concat_audio(chunks, format="MP3"):
+    """Concatenates in-memory audio chunks without decoding them."""
+    if format == "OGG_OPUS":
+        return concat_ogg(chunks)
+    return concat_mp3(chunks)
@@ -0,0 +1,469 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import subprocess
+from ffmpeg_runner import run_ffmpeg, run_ffprobe
+
+try:
+    import resource  # Peak RSS; not available on Windows
+except ImportError:
+    resource = None
+
+# Offline benchmarks for the media stages. Fixtures (test-pattern avatar clips, multi-page
+# PDF decks, speech-like MP3 audio) are generated locally, so no real decks or API keys are
+# needed. Every stage runs in its own process, inside the fixture directory, so the module
+# paths ("./data/...") point at the fixtures and peak RSS is measured per stage.
+#
+#   python benchmark.py                       # Run all cases and compare with the baseline
+#   python benchmark.py crop_square concat    # Only some cases
+#   python benchmark.py --save-baseline       # Record the results as the new baseline
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_DIR = "./data/benchmark"  # Fixtures and stage outputs; its data/ is what the stages see as ./data
+BASELINE_FILE = "./data/benchmark_baseline.json"
+REGRESSION_THRESHOLD = 0.10  # Slower than the baseline by more than this counts as a regression
+
+# Fixture defaults; the real decks are 14 + 5 slides over ~6 minutes
+DEFAULT_SECONDS = 60  # Length of the avatar clip, the audio and the slide timeline
+DEFAULT_AVATAR_SIZE = "1280x720"
+DEFAULT_DECK_PAGES = [14, 5]  # Pages of Presentation1.pdf and Presentation2.pdf
+DEFAULT_SCRIPT_SENTENCES = 20_000
+AVATAR_FPS = 30
+AVATAR_PARTS = 3  # Clips for the concat case, like the avatar parts of a long script
+PAGE_SIZE = (960, 540)  # Pixels at 72 dpi, i.e. points, the size of a 16:9 slide
+OUTPUT_FPS = 30  # Frame rate of the final video; frames/s is counted against it for every case
+
+def fixture_params(args):
+    return {
+        "seconds": args.seconds,
+        "avatar_size": args.avatar_size,
+        "deck_pages": args.deck_pages,
+        "script_sentences": args.script_sentences,
+    }
+
+def slide_durations(seconds, count):
+    """Spreads seconds over count slides in whole seconds, at least one each."""
+    base, extra = divmod(seconds, count)
+    return [max(1, base + (1 if i < extra else 0)) for i in range(count)]
+
+def generate_deck(path, pages, first_number):
+    """Writes a multi-page PDF of synthetic slides, each with distinct content."""
+    from PIL import Image, ImageDraw
+
+    images = []
+    for i in range(pages):
+        number = first_number + i
+        image = Image.new("RGB", PAGE_SIZE, (255, 255, 255))
+        draw = ImageDraw.Draw(image)
+        draw.rectangle([0, 0, PAGE_SIZE[0], 70], fill=(30, 60 + (number * 37) % 160, 120))
+        draw.text((30, 25), f"Benchmark slide {number}", fill=(255, 255, 255))
+        for line in range(8):
+            y = 110 + line * 45
+            draw.rectangle([60, y, 60 + (number * 53 + line * 97) % 700 + 100, y + 20], fill=(90, 90, 90))
+        draw.ellipse([700, 300, 900, 500], outline=(200, 40, 40), width=6)
+        images.append(image)
+    images[0].save(path, "PDF", save_all=True, append_images=images[1:], resolution=72)
+
+def generate_avatar(path, seconds, size):
+    """Encodes a lavfi test-pattern clip with a tone, shaped like a D-ID avatar download."""
+    return run_ffmpeg([
+        "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={size}:rate={AVATAR_FPS}:duration={seconds}",
+        "-f", "lavfi", "-i", f"sine=frequency=220:sample_rate=48000:duration={seconds}",
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        "-g", str(AVATAR_FPS * 2),  # Keyframes every 2s, so the segment-parallel crop can split it
+        "-c:a", "aac", "-shortest", "-y", path
+    ], label="fixture avatar").ok
+
+def generate_speech(path, seconds):
+    """Encodes speech-like audio: a wobbling pitch in syllable-rate bursts, mono 24 kHz MP3 like the TTS output."""
+    return run_ffmpeg([
+        "-v", "error",
+        "-f", "lavfi", "-i", f"aevalsrc='0.4*sin(2*PI*(160+40*sin(2*PI*3*t))*t)*(0.5+0.5*sin(2*PI*4*t))':"
+                             f"s=24000:d={seconds}",
+        "-c:a", "libmp3lame", "-b:a", "64k", "-ac", "1", "-y", path
+    ], label="fixture speech").ok
+
+def prepare_fixtures(bench_dir, params):
+    """Generates the fixtures into bench_dir/data, unless they exist for the same parameters."""
+    data_dir = os.path.join(bench_dir, "data")
+    params_file = os.path.join(data_dir, "fixtures.json")
+    if os.path.exists(params_file):
+        with open(params_file, "r", encoding="utf-8") as f:
+            if json.load(f) == params:
+                print("⏭️ Fixtures are up to date")
+                return True
+
+    if os.path.exists(bench_dir) and os.listdir(bench_dir) and not os.path.exists(params_file):
+        print(f"❌ {bench_dir} exists and is not a benchmark directory, not replacing it")
+        return False
+
+    print(f"🧪 Generating fixtures in {data_dir}...")
+    shutil.rmtree(bench_dir, ignore_errors=True)
+    os.makedirs(data_dir)
+
+    seconds = params["seconds"]
+    decks, first_number = [], 1
+    for n, pages in enumerate(params["deck_pages"], start=1):
+        name = f"Presentation{n}.pdf"  # The names split_presenation.py looks for
+        generate_deck(os.path.join(data_dir, name), pages, first_number)
+        decks.append({"file": name})
+        first_number += pages
+
+    durations = slide_durations(seconds, first_number - 1)
+    start = 0
+    for deck, pages in zip(decks, params["deck_pages"]):
+        deck["durations"] = durations[start:start + pages]
+        start += pages
+    with open(os.path.join(data_dir, "decks.json"), "w", encoding="utf-8") as f:
+        json.dump({"decks": decks}, f, indent=4)
+
+    part_seconds = max(1, seconds // AVATAR_PARTS)
+    ok = generate_avatar(os.path.join(data_dir, "avatar_video.mp4"), seconds, params["avatar_size"])
+    for n in range(1, AVATAR_PARTS + 1):
+        ok = ok and generate_avatar(os.path.join(data_dir, f"avatar_part{n}.mp4"), part_seconds, params["avatar_size"])
+    ok = ok and generate_speech(os.path.join(data_dir, "output.mp3"), seconds)
+    if not ok:
+        print("❌ Could not generate the fixtures")
+        return False
+
+    with open(params_file, "w", encoding="utf-8") as f:
+        json.dump(params, f, indent=4)
+    print("✅ Fixtures ready")
+    return True
+
+def media_seconds(path):
+    """Returns the duration of a media file in seconds, or None if it cannot be probed."""
+    returncode, stdout, _ = run_ffprobe(["-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path])
+    try:
+        return float(stdout.strip()) if returncode == 0 else None
+    except ValueError:
+        return None
+
+def avatar_geometry(path):
+    """Returns (width, height) of the avatar fixture."""
+    _, stdout, _ = run_ffprobe(["-v", "error", "-select_streams", "v:0", "-show_entries", "stream=width,height",
+                                "-of", "csv=p=0", path])
+    width, height = stdout.strip().split(",")
+    return int(width), int(height)
+
+# Cases. Every case has a prepare step, run untimed in its own process, and a run step that
+# times the stage call with timed() and returns what it produced: {"output_seconds": ...} for
+# media, {"units": ..., "unit": ...} otherwise. They run inside the fixture directory, so the
+# stage modules' ./data paths point at the fixtures.
+
+def timed(outcome, func, *args, **kwargs):
+    """Calls func and stores its wall time in outcome["seconds"]. Returns func's result."""
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    outcome["seconds"] = time.perf_counter() - started
+    return result
+
+def prepare_split_pdfs(params):
+    shutil.rmtree("./data/slides", ignore_errors=True)
+
+def run_split_pdfs(params):
+    from split_presenation import split_pdfs_into_slides
+
+    outcome = {}
+    timed(outcome, split_pdfs_into_slides, "./data", "./data/slides")
+    pages = len(os.listdir("./data/slides")) if os.path.isdir("./data/slides") else 0
+    return {**outcome, "output_seconds": params["seconds"], "ok": pages == sum(params["deck_pages"])}
+
+def prepare_rasterize(params):
+    import slide2vid
+
+    shutil.rmtree(slide2vid.IMAGES_DIR, ignore_errors=True)
+    os.makedirs(slide2vid.IMAGES_DIR)
+
+def run_rasterize(params):
+    import slide2vid
+
+    outcome = {}
+    image_files = timed(outcome, slide2vid.convert_slides_to_images)
+    return {**outcome, "output_seconds": params["seconds"], "ok": len(image_files) == sum(params["deck_pages"])}
+
+def prepare_slides_video(params):
+    import slide2vid
+
+    os.makedirs(slide2vid.IMAGES_DIR, exist_ok=True)
+    slide2vid.convert_slides_to_images()  # Renders the images unless the rasterize case left them
+    shutil.rmtree(slide2vid.SEGMENTS_DIR, ignore_errors=True)  # Cold segment cache
+
+def run_slides_video(params):
+    import slide2vid
+
+    outcome = {}
+    image_files = slide2vid.convert_slides_to_images()  # All rendered by now, so this only lists them
+    ok = timed(outcome, slide2vid.create_video_from_slides, image_files, profile=params["profile"])
+    return {**outcome, "output_seconds": media_seconds(slide2vid.OUTPUT_VIDEO), "ok": ok}
+
+def run_crop_square(params):
+    from crop_square import crop_square_video
+
+    outcome = {}
+    width, height = avatar_geometry("./data/avatar_video.mp4")
+    region = ((width - height) // 2, 0, height, height)
+    ok = timed(outcome, crop_square_video, "./data/avatar_video.mp4", "./data/bench_crop_square.mp4", region)
+    return {**outcome, "output_seconds": media_seconds("./data/bench_crop_square.mp4"), "ok": ok}
+
+def run_crop_circular(params):
+    from crop_circular import crop_circular_video
+
+    outcome = {}
+    width, height = avatar_geometry("./data/avatar_video.mp4")
+    ok = timed(outcome, crop_circular_video, "./data/avatar_video.mp4", "./data/bench_crop_circular.mp4",
+               (width // 2, height // 2), height // 2 - 10)
+    return {**outcome, "output_seconds": media_seconds("./data/bench_crop_circular.mp4"), "ok": ok}
+
+def run_crop_circular_parallel(params):
+    from crop_circular import crop_circular_video_parallel
+
+    outcome = {}
+    width, height = avatar_geometry("./data/avatar_video.mp4")
+    ok = timed(outcome, crop_circular_video_parallel, "./data/avatar_video.mp4",
+               "./data/bench_crop_circular_parallel.mp4", (width // 2, height // 2), height // 2 - 10,
+               os.cpu_count() or 1)
+    return {**outcome, "output_seconds": media_seconds("./data/bench_crop_circular_parallel.mp4"), "ok": ok}
+
+def run_concat(params):
+    from concat_video import concatenate_videos
+
+    outcome = {}
+    parts = [f"./data/avatar_part{n}.mp4" for n in range(1, AVATAR_PARTS + 1)]
+    ok = timed(outcome, concatenate_videos, parts, "./data/bench_concat.mp4")
+    return {**outcome, "output_seconds": media_seconds("./data/bench_concat.mp4"), "ok": ok}
+
+def prepare_assemble(params):
+    import slide2vid
+
+    if not os.path.exists(slide2vid.OUTPUT_VIDEO):
+        prepare_slides_video(params)
+        slide2vid.create_video_from_slides(slide2vid.convert_slides_to_images(), profile=params["profile"])
+
+def run_assemble(params):
+    import slide2vid
+    from assemble_video import assemble_video
+
+    outcome = {}
+    ok = timed(outcome, assemble_video, slide2vid.OUTPUT_VIDEO, "./data/avatar_video.mp4", "./data/bench_assemble.mp4")
+    return {**outcome, "output_seconds": media_seconds("./data/bench_assemble.mp4"), "ok": ok}
+
+def prepare_compose(params):
+    import slide2vid
+
+    os.makedirs(slide2vid.IMAGES_DIR, exist_ok=True)
+    slide2vid.convert_slides_to_images()
+
+def run_compose(params):
+    import slide2vid
+    from assemble_video import compose_video
+
+    outcome = {}
+    image_files = slide2vid.convert_slides_to_images()
+    ok = timed(outcome, compose_video, image_files, slide2vid.load_slide_durations(), "./data/avatar_video.mp4",
+               "./data/bench_compose.mp4", audio_source="./data/output.mp3")
+    return {**outcome, "output_seconds": media_seconds("./data/bench_compose.mp4"), "ok": ok}
+
+def run_split_text(params):
+    from benchmark_split_text import generate_script
+    from TextToSpeech_Google import split_text
+
+    outcome = {}
+    text = generate_script(params["script_sentences"])
+    chunks = timed(outcome, split_text, text)
+    return {**outcome, "units": len(text.encode("utf-8")) / 1024 / 1024, "unit": "MB", "ok": bool(chunks)}
+
+# name -> (prepare, run), in dependency order: later cases reuse what earlier ones left behind
+CASES = {
+    "split_pdfs": (prepare_split_pdfs, run_split_pdfs),
+    "rasterize": (prepare_rasterize, run_rasterize),
+    "slides_video": (prepare_slides_video, run_slides_video),
+    "crop_square": (None, run_crop_square),
+    "crop_circular": (None, run_crop_circular),
+    "crop_circular_parallel": (None, run_crop_circular_parallel),
+    "concat": (None, run_concat),
+    "assemble": (prepare_assemble, run_assemble),
+    "compose": (prepare_compose, run_compose),
+    "split_text": (None, run_split_text),
+}
+
+def peak_rss_mb():
+    """Peak RSS of this process or the largest of its finished children (FFmpeg, pool workers), in MB."""
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024  # Bytes on macOS, KB on Linux
+
+def child_main(case, phase, params_json, result_file):
+    """Entry point of a stage process: runs one phase of one case in the fixture directory."""
+    params = json.loads(params_json)
+    prepare, run = CASES[case]
+    if phase == "prepare":
+        if prepare:
+            prepare(params)
+        return
+
+    outcome = run(params)
+    outcome["peak_rss_mb"] = peak_rss_mb()
+    with open(result_file, "w", encoding="utf-8") as f:
+        json.dump(outcome, f)
+
+def run_phase(case, phase, params, bench_dir, verbose):
+    """Runs one phase of a case in a fresh process. Returns the run outcome, or None on failure."""
+    result_file = os.path.join(os.path.abspath(bench_dir), f".{case}.result.json")
+    if os.path.exists(result_file):
+        os.remove(result_file)
+
+    command = [sys.executable, os.path.join(REPO_DIR, "benchmark.py"), "--child", case, phase,
+               json.dumps(params), result_file]
+    env = {**os.environ, "PYTHONIOENCODING": "utf-8"}
+    output = None if verbose else subprocess.DEVNULL
+    returncode = subprocess.run(command, cwd=bench_dir, env=env, stdout=output, stderr=output).returncode
+    if returncode != 0:
+        print(f"❌ {case}: {phase} failed with exit code {returncode}" + ("" if verbose else " (rerun with --verbose)"))
+        return None
+    if phase == "prepare":
+        return {}
+    with open(result_file, "r", encoding="utf-8") as f:
+        outcome = json.load(f)
+    os.remove(result_file)
+    return outcome
+
+def summarize(outcome):
+    """Adds frames/s and seconds per minute of output to a run outcome."""
+    seconds = outcome["seconds"]
+    output_seconds = outcome.get("output_seconds")
+    if output_seconds:
+        outcome["fps"] = output_seconds * OUTPUT_FPS / seconds
+        outcome["s_per_min"] = seconds / (output_seconds / 60)
+    elif outcome.get("units"):
+        outcome["rate"] = outcome["units"] / seconds
+    return outcome
+
+def run_case(case, params, bench_dir, repeat, verbose):
+    """Prepares and runs a case repeat times and keeps the fastest run."""
+    best = None
+    for _ in range(repeat):
+        if run_phase(case, "prepare", params, bench_dir, verbose) is None:
+            return None
+        outcome = run_phase(case, "run", params, bench_dir, verbose)
+        if outcome is None:
+            return None
+        if not outcome.get("ok"):
+            print(f"❌ {case}: the stage reported a failure" + ("" if verbose else " (rerun with --verbose)"))
+            return None
+        if best is None or outcome["seconds"] < best["seconds"]:
+            best = outcome
+    return summarize(best)
+
+def format_row(case, result):
+    if "fps" in result:
+        rate = f"{result['fps']:8.1f} fps"
+        per_minute = f"{result['s_per_min']:8.2f}"
+    else:
+        rate = f"{result.get('rate', 0):8.1f} {result.get('unit', '')}/s"
+        per_minute = f"{'-':>8}"
+    rss = f"{result['peak_rss_mb']:8.0f}" if result.get("peak_rss_mb") is not None else f"{'-':>8}"
+    return f"{case:<24} {result['seconds']:9.2f} {rate:>14} {per_minute:>10} {rss:>12}"
+
+def ffmpeg_version():
+    try:
+        result = subprocess.run(["ffmpeg", "-version"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        return result.stdout.splitlines()[0] if result.stdout else None
+    except OSError:
+        return None
+
+def machine_info():
+    return {"platform": platform.platform(), "python": platform.python_version(),
+            "cpus": os.cpu_count(), "ffmpeg": ffmpeg_version()}
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Prints the change against the baseline per case. Returns the names of the cases that got slower."""
+    if baseline["params"] != results["params"]:
+        print("⚠️ The baseline was recorded with other fixture parameters, the comparison is not meaningful.")
+    if baseline["machine"] != results["machine"]:
+        print(f"⚠️ The baseline was recorded on another machine: {baseline['machine']}")
+
+    regressions = []
+    print(f"📊 Compared with the baseline from {time.strftime('%Y-%m-%d %H:%M', time.localtime(baseline['created_at']))}:")
+    for case, result in results["cases"].items():
+        old = baseline["cases"].get(case)
+        if old is None:
+            print(f"   {case:<24} new")
+            continue
+        change = result["seconds"] / old["seconds"] - 1
+        line = f"   {case:<24} time {change:+7.1%}"
+        if result.get("peak_rss_mb") and old.get("peak_rss_mb"):
+            line += f"   peak RSS {result['peak_rss_mb'] / old['peak_rss_mb'] - 1:+7.1%}"
+        if change > threshold:
+            line += "   ⚠️ slower"
+            regressions.append(case)
+        print(line)
+    return regressions
+
+def main(args):
+    unknown = set(args.cases) - set(CASES)
+    if unknown:
+        print(f"❌ Unknown cases: {', '.join(sorted(unknown))}. Cases: {', '.join(CASES)}")
+        return False
+    cases = [case for case in CASES if not args.cases or case in args.cases]
+
+    params = fixture_params(args)
+    if not prepare_fixtures(args.bench_dir, params):
+        return False
+    params["profile"] = args.profile
+
+    results = {"params": params, "machine": machine_info(), "created_at": time.time(), "cases": {}}
+    print(f"{'case':<24} {'seconds':>9} {'rate':>14} {'s/min out':>10} {'peak RSS MB':>12}")
+    for case in cases:
+        result = run_case(case, params, args.bench_dir, args.repeat, args.verbose)
+        if result is not None:
+            results["cases"][case] = result
+            print(format_row(case, result))
+
+    if len(results["cases"]) < len(cases):
+        print(f"⚠️ {len(cases) - len(results['cases'])} of {len(cases)} cases failed")
+
+    if args.save_baseline and results["cases"]:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+        print(f"💾 Saved the baseline to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            if compare(results, json.load(f), args.threshold):
+                return False
+    return len(results["cases"]) == len(cases)
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        child_main(*sys.argv[2:6])
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description="Benchmarks the media stages on generated fixtures.")
+    parser.add_argument("cases", nargs="*", help=f"Cases to run (default: all). Cases: {', '.join(CASES)}")
+    parser.add_argument("--seconds", type=int, default=DEFAULT_SECONDS, help="Length of the generated video and audio")
+    parser.add_argument("--avatar-size", default=DEFAULT_AVATAR_SIZE, help="Resolution of the avatar clips, WxH")
+    # split_presenation.py only reads Presentation1.pdf and Presentation2.pdf, so there are always two decks
+    parser.add_argument("--deck-pages", type=int, nargs=2, default=DEFAULT_DECK_PAGES, metavar=("PAGES1", "PAGES2"),
+                        help="Pages of the two generated decks")
+    parser.add_argument("--script-sentences", type=int, default=DEFAULT_SCRIPT_SENTENCES,
+                        help="Sentences in the split_text script")
+    parser.add_argument("--profile", default="still", help="slide2vid encoding profile for the slide segments")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case; the fastest counts")
+    parser.add_argument("--bench-dir", default=BENCH_DIR)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Relative slowdown that counts as a regression")
+    parser.add_argument("--verbose", action="store_true", help="Show the output of the stages")
+    args = parser.parse_args()
+
+    if not main(args):
+        sys.exit(1)
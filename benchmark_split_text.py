@@ -0,0 +1,67 @@
+import sys
+import time
+import random
+from TextToSpeech_Google import split_text, MAX_TTS_CHUNK_SIZE
+
+# Script sizes to benchmark (number of sentences)
+SIZES = [1_000, 5_000, 20_000]
+REPEATS = 3
+
+# Mix of ASCII and multibyte words, so byte and character offsets differ
+WORDS = [
+    "recurrent", "neural", "network", "gradient", "memory", "attention", "sequence", "LSTM", "GRU",
+    "Größe", "über", "Maßstab", "Schlüssel", "Grüße", "Äpfel", "naïve", "café", "résumé"
+]
+
+def generate_script(sentences, seed=0):
+    """Generates a script with sentence punctuation and paragraph breaks."""
+    rng = random.Random(seed)
+    parts = []
+    for i in range(sentences):
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 30)))
+        parts.append(sentence.capitalize() + rng.choice(".!?"))
+        if i % 8 == 7:
+            parts.append("\n\n")
+    return " ".join(parts)
+
+def split_text_legacy(text, max_size=MAX_TTS_CHUNK_SIZE):
+    """Previous implementation, kept here for comparison."""
+    chunks = []
+    while len(text.encode("utf-8")) > max_size:
+        split_index = text.rfind(".", 0, max_size)
+        if split_index == -1:
+            split_index = max_size  # If no period is found, force split
+        chunks.append(text[:split_index + 1])
+        text = text[split_index + 1:].lstrip()
+    chunks.append(text)
+    return chunks
+
+def best_time(func, text, **kwargs):
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        chunks = func(text, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, chunks
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    print(f"{'sentences':>10} {'MB':>6} {'function':>16} {'time (ms)':>10} {'chunks':>7} {'max bytes':>10} {'over limit':>10}")
+
+    for sentences in sizes:
+        text = generate_script(sentences)
+        megabytes = len(text.encode("utf-8")) / 1024 / 1024
+
+        for name, func, kwargs in [
+            ("legacy", split_text_legacy, {}),
+            ("split_text", split_text, {}),
+            ("split_text(bal)", split_text, {"balance": True}),
+        ]:
+            elapsed, chunks = best_time(func, text, **kwargs)
+            sizes_in_bytes = [len(chunk.encode("utf-8")) for chunk in chunks]
+            over = sum(size > MAX_TTS_CHUNK_SIZE for size in sizes_in_bytes)
+            print(f"{sentences:>10} {megabytes:>6.2f} {name:>16} {elapsed * 1000:>10.1f} {len(chunks):>7} "
+                  f"{max(sizes_in_bytes):>10} {over:>10}")
+
+if __name__ == "__main__":
+    main()
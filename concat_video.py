@@ -1,36 +1,162 @@
-import subprocess
 import os
+import json
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from ffmpeg_runner import run_ffmpeg, run_ffprobe, x264_args
 
-def concatenate_videos(input_videos, output_video):
-    """Concatenate multiple video files into one with sound."""
-    # Check if all input files exist
-    for video in input_videos:
-        if not os.path.exists(video):
-            print(f"❌ Input video {video} not found!")
-            return False
+# Stream parameters that must be identical for a lossless concat demuxer join
+VIDEO_KEYS = ("codec_name", "profile", "width", "height", "pix_fmt", "r_frame_rate", "time_base")
+AUDIO_KEYS = ("codec_name", "sample_rate", "channels", "time_base")
+
+# ffprobe profile names mapped to the matching libx264 -profile:v value
+X264_PROFILES = {"Constrained Baseline": "baseline", "Main": "main", "High": "high"}
+
+def probe_streams(video):
+    """Returns the first video and audio stream parameters of a file as a hashable signature."""
+    returncode, stdout, stderr = run_ffprobe([
+        "-v", "error",
+        "-show_entries", "stream=codec_type,codec_name,profile,width,height,pix_fmt,r_frame_rate,"
+                         "time_base,sample_rate,channels",
+        "-of", "json", video
+    ])
+    if returncode != 0:
+        print(f"❌ ffprobe failed for {video}: {stderr}")
+        return None
+
+    streams = json.loads(stdout).get("streams", [])
+    video_stream = next((s for s in streams if s.get("codec_type") == "video"), None)
+    audio_stream = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    if video_stream is None:
+        return None
+
+    return (
+        tuple(video_stream.get(key) for key in VIDEO_KEYS),
+        tuple(audio_stream.get(key) for key in AUDIO_KEYS) if audio_stream else None
+    )
+
+def normalize_video(input_video, output_video, signature):
+    """Re-encodes a video so its stream parameters match the given signature."""
+    (_, profile, width, height, pix_fmt, frame_rate, time_base), audio = signature
+    command = [
+        "-i", input_video,
+        "-vf", f"scale={width}:{height},fps={frame_rate},format={pix_fmt}",
+        *x264_args(),
+        "-video_track_timescale", time_base.split("/")[1],
+    ]
+    if profile in X264_PROFILES:
+        command += ["-profile:v", X264_PROFILES[profile]]
+    if audio:
+        _, sample_rate, channels, _ = audio
+        command += ["-c:a", "aac", "-ar", str(sample_rate), "-ac", str(channels)]
+    command += ["-y", output_video]
+
+    print(f"🔧 Normalizing {input_video} to {width}x{height} @ {frame_rate}...")
+    result = run_ffmpeg(command, label=f"normalize {os.path.basename(input_video)}")
+    if not result.ok:
+        print(f"❌ Error normalizing {input_video}: {result.stderr}")
+        return False
+    return True
+
+def concat_copy(input_videos, output_video):
+    """Joins videos with identical stream parameters using the concat demuxer without re-encoding."""
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False, encoding="utf-8") as f:
+        for video in input_videos:
+            f.write(f"file '{os.path.abspath(video).replace(os.sep, '/')}'\n")
+        list_file = f.name
+
+    command = [
+        "-f", "concat", "-safe", "0", "-i", list_file,
+        "-c", "copy",               # Stream copy, no re-encode
+        "-movflags", "+faststart",
+        "-y", output_video
+    ]
+
+    print(f"Running FFmpeg command: ffmpeg {' '.join(command)}")
+    try:
+        result = run_ffmpeg(command, label="concat (copy)")
+    finally:
+        os.remove(list_file)
+
+    if result.ok:
+        print(f"✅ Successfully concatenated videos without re-encoding: {output_video}")
+        return True
+    else:
+        print(f"❌ Error during stream-copy concatenation: {result.stderr}")
+        return False
 
+def concat_reencode(input_videos, output_video):
+    """Concatenate multiple video files into one with sound by re-encoding through the concat filter."""
     # Build FFmpeg command with video and audio
     filter_complex = "".join(f"[{i}:v][{i}:a]" for i in range(len(input_videos))) + f"concat=n={len(input_videos)}:v=1:a=1[outv][outa]"
-    command = ['ffmpeg'] + sum([['-i', video] for video in input_videos], []) + [
+    command = sum([['-i', video] for video in input_videos], []) + [
         '-filter_complex', filter_complex,
         '-map', '[outv]',           # Map video output
         '-map', '[outa]',           # Map audio output
-        '-c:v', 'libx264',          # Re-encode video
+        *x264_args(),               # Re-encode video
         '-c:a', 'aac',              # Re-encode audio
         '-y',                       # Overwrite output
         output_video
     ]
 
-    print(f"Running FFmpeg command: {' '.join(command)}")
-    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    print(f"Running FFmpeg command: ffmpeg {' '.join(command)}")
+    result = run_ffmpeg(command, label="concat (re-encode)")
 
-    if result.returncode == 0:
+    if result.ok:
         print(f"✅ Successfully concatenated videos with sound: {output_video}")
         return True
     else:
-        print(f"❌ Error during concatenation: {result.stderr.decode()}")
+        print(f"❌ Error during concatenation: {result.stderr}")
         return False
 
+def concatenate_videos(input_videos, output_video, max_workers=None):
+    """Concatenate multiple video files into one with sound.
+
+    Inputs whose streams already match are joined by stream copy; only the
+    mismatched ones are re-encoded (in parallel) before the join.
+    """
+    # Check if all input files exist
+    for video in input_videos:
+        if not os.path.exists(video):
+            print(f"❌ Input video {video} not found!")
+            return False
+
+    signatures = [probe_streams(video) for video in input_videos]
+    if any(signature is None for signature in signatures):
+        print("⚠️ Could not probe all inputs, falling back to re-encoding.")
+        return concat_reencode(input_videos, output_video)
+
+    # Mixing files with and without audio cannot be fixed by normalizing one side
+    if len({signature[1] is None for signature in signatures}) > 1:
+        print("⚠️ Some inputs have no audio track, falling back to re-encoding.")
+        return concat_reencode(input_videos, output_video)
+
+    reference = Counter(signatures).most_common(1)[0][0]
+    mismatched = [i for i, signature in enumerate(signatures) if signature != reference]
+
+    if not mismatched:
+        print("⚡ All inputs share codec, resolution and timebase. Using stream copy.")
+        return concat_copy(input_videos, output_video)
+
+    print(f"🔧 {len(mismatched)}/{len(input_videos)} inputs differ from the reference stream parameters.")
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_video))) as temp_dir:
+        normalized = list(input_videos)
+        for i in mismatched:
+            normalized[i] = os.path.join(temp_dir, f"normalized_{i}.mp4")
+
+        with ThreadPoolExecutor(max_workers=max_workers or len(mismatched)) as pool:
+            results = list(pool.map(
+                lambda i: normalize_video(input_videos[i], normalized[i], reference), mismatched
+            ))
+
+        if all(results):
+            # Re-probe: the encoder may still pick a different profile than the reference
+            if all(probe_streams(normalized[i]) == reference for i in mismatched):
+                return concat_copy(normalized, output_video)
+
+        print("⚠️ Normalized inputs still differ, falling back to re-encoding.")
+        return concat_reencode(input_videos, output_video)
+
 if __name__ == "__main__":
     # Input videos
     input_videos = [
@@ -41,4 +167,4 @@ if __name__ == "__main__":
     output_video = "./data/final_avatar_video.mp4"
 
     # Run concatenation
-    concatenate_videos(input_videos, output_video)
\ No newline at end of file
+    concatenate_videos(input_videos, output_video)
@@ -1,13 +1,21 @@
 import cv2
 import numpy as np
 import os
+import json
+import time
+import argparse
+import tempfile
 import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from ffmpeg_runner import FFmpegProcess, run_ffmpeg, run_ffprobe, x264_args
+from crop_region import add_region_arguments, resolve_region, region_to_circle
 
 # Input and Output Paths
 INPUT_VIDEO = r"C:\Users\eprot\OneDrive - Hochschule Düsseldorf\Dokumente\Uni\6. Semester (NO)\CV and DL\automated-video-generation\data\avatar_video.mp4"
-TEMP_VIDEO = r"C:\Users\eprot\OneDrive - Hochschule Düsseldorf\Dokumente\Uni\6. Semester (NO)\CV and DL\automated-video-generation\data\temp_cropped_video.avi"
 OUTPUT_VIDEO = r"C:\Users\eprot\OneDrive - Hochschule Düsseldorf\Dokumente\Uni\6. Semester (NO)\CV and DL\automated-video-generation\data\cropped_avatar.mp4"
-AUDIO_FILE = r"C:\Users\eprot\OneDrive - Hochschule Düsseldorf\Dokumente\Uni\6. Semester (NO)\CV and DL\automated-video-generation\data\original_audio.aac"
+
+# Print a progress line every N frames
+PROGRESS_INTERVAL = 250
 
 # Global variables for cropping
 ref_point = []
@@ -32,87 +40,292 @@ def click_and_crop(event, x, y, flags, param):
         cv2.circle(preview, center, radius, (255, 255, 255), 2)  # White outline, thickness=2
         cv2.imshow("Select Avatar Area", preview)
 
+def select_circle(input_video):
+    """Lets the user drag a circle on the first frame and returns (center, radius)."""
+    global frame
+
+    # Open the video and grab the first frame for selection
+    cap = cv2.VideoCapture(input_video)
+    ret, frame = cap.read()
+    cap.release()
 
-# Open the video and grab the first frame for selection
-cap = cv2.VideoCapture(INPUT_VIDEO)
-ret, frame = cap.read()
-cap.release()
+    if not ret:
+        print("❌ Error: Couldn't read the video file!")
+        return None
 
-if not ret:
-    print("❌ Error: Couldn't read the video file!")
-    exit()
+    cv2.imshow("Select Avatar Area", frame)
+    cv2.setMouseCallback("Select Avatar Area", click_and_crop)
 
-cv2.imshow("Select Avatar Area", frame)
-cv2.setMouseCallback("Select Avatar Area", click_and_crop)
+    print("🖱️ Select the area with your mouse (click and drag to define a circle) and press 'Enter' when done.")
+    cv2.waitKey(0)
+    cv2.destroyAllWindows()
 
-print("🖱️ Select the area with your mouse (click and drag to define a circle) and press 'Enter' when done.")
-cv2.waitKey(0)
-cv2.destroyAllWindows()
+    if len(ref_point) < 2:
+        print("❌ No selection made. Exiting.")
+        return None
 
-if len(ref_point) < 2:
-    print("❌ No selection made. Exiting.")
-    exit()
+    # Calculate crop center and radius
+    x1, y1 = ref_point[0]
+    x2, y2 = ref_point[1]
+    radius = int(((x2 - x1)**2 + (y2 - y1)**2) ** 0.5 / 2)
+    center = ((x1 + x2) // 2, (y1 + y2) // 2)
+    return center, radius
 
-# Calculate crop center and radius
-x1, y1 = ref_point[0]
-x2, y2 = ref_point[1]
-radius = int(((x2 - x1)**2 + (y2 - y1)**2) ** 0.5 / 2)
-center = ((x1 + x2) // 2, (y1 + y2) // 2)
+def probe_video(input_video):
+    """Returns width, height, frame rate (as an FFmpeg rational string) and frame count of a video."""
+    returncode, stdout, stderr = run_ffprobe([
+        "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=width,height,r_frame_rate,nb_frames",
+        "-of", "json", input_video
+    ])
+    if returncode != 0:
+        print(f"❌ ffprobe failed: {stderr}")
+        return None
 
-# Reopen the video for processing
-cap = cv2.VideoCapture(INPUT_VIDEO)
-frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-fps = cap.get(cv2.CAP_PROP_FPS)
-frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    stream = json.loads(stdout)["streams"][0]
+    frame_count = int(stream["nb_frames"]) if stream.get("nb_frames", "N/A").isdigit() else 0
+    return int(stream["width"]), int(stream["height"]), stream["r_frame_rate"], frame_count
 
-# Initialize VideoWriter for direct output
-fourcc = cv2.VideoWriter_fourcc(*'XVID')  # Use AVI because MP4 with OpenCV won't store audio
-out = cv2.VideoWriter(TEMP_VIDEO, fourcc, fps, (frame_width, frame_height))
+def build_circle_mask(width, height, center, radius):
+    """Builds the constant circular mask once; it is reused for every frame."""
+    mask = np.zeros((height, width, 3), dtype=np.uint8)
+    cv2.circle(mask, center, radius, (255, 255, 255), -1)
+    return mask
 
-print(f"🎥 Processing {frame_count} frames directly to {TEMP_VIDEO}...")
+def read_frame(stream, buffer):
+    """Fills a preallocated frame buffer from a raw video pipe. Returns False at end of stream."""
+    view = memoryview(buffer).cast("B")
+    filled = 0
+    while filled < len(view):
+        n = stream.readinto(view[filled:])
+        if not n:
+            return False
+        filled += n
+    return True
 
-frame_idx = 0
-while cap.isOpened():
-    ret, frame = cap.read()
-    if not ret:
-        break
+def mask_frames(reader_args, writer_args, width, height, mask, frame_count, label=""):
+    """Pumps raw frames from a decoder pipe through the mask into an encoder pipe.
 
-    # Create a circular mask with alpha channel
-    mask = np.zeros_like(frame, dtype=np.uint8)
-    cv2.circle(mask, center, radius, (255, 255, 255), -1)
+    Returns (frames processed, whether both FFmpeg processes succeeded in time, encoder stderr).
+    """
+    frame_buffer = np.empty((height, width, 3), dtype=np.uint8)
+
+    # The frame loop below reports progress, so FFmpeg's own progress lines are not printed
+    reader = FFmpegProcess(reader_args, label=f"decode{label}", on_progress=lambda event: None,
+                           stdout=subprocess.PIPE)
+    writer = FFmpegProcess(writer_args, label=f"encode{label}", on_progress=lambda event: None,
+                           stdin=subprocess.PIPE)
+
+    frame_idx = 0
+    start = time.perf_counter()
+    try:
+        while read_frame(reader.stdout, frame_buffer):
+            # Apply mask in place to keep only the circular area
+            cv2.bitwise_and(frame_buffer, mask, dst=frame_buffer)
+            writer.stdin.write(frame_buffer.data)
+
+            frame_idx += 1
+            if frame_idx % PROGRESS_INTERVAL == 0:
+                elapsed = time.perf_counter() - start
+                print(f"[+]{label} Processed {frame_idx}/{frame_count} frames ({frame_idx / elapsed:.1f} fps)...")
+    except BrokenPipeError:
+        print(f"❌{label} Encoder closed the pipe early.")
+    finally:
+        reader.stdout.close()
+        reader_result = reader.wait()
+        writer.stdin.close()
+        result = writer.wait()
+
+    # A decoder that timed out ends the stream early, which the encoder alone would not notice
+    return frame_idx, result.ok and not reader_result.timed_out, result.stderr
+
+def crop_circular_video(input_video, output_video, center, radius):
+    """Masks every frame to a circle and encodes video plus the original audio in a single pass."""
+    info = probe_video(input_video)
+    if info is None:
+        return False
+    width, height, fps, frame_count = info
+
+    mask = build_circle_mask(width, height, center, radius)
+
+    # Decoder: raw BGR frames on stdout, no intermediate file
+    reader_args = [
+        "-v", "error", "-i", input_video,
+        "-an", "-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1"
+    ]
+    # Encoder: raw frames on stdin, audio copied straight from the original video
+    writer_args = [
+        "-v", "error",
+        "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", fps, "-i", "pipe:0",
+        "-i", input_video,
+        "-map", "0:v", "-map", "1:a?",
+        *x264_args(), "-pix_fmt", "yuv420p",
+        "-c:a", "copy",
+        "-shortest", "-y", output_video
+    ]
+
+    print(f"🎥 Processing {frame_count} frames directly to {output_video}...")
+    frames, ok, stderr = mask_frames(reader_args, writer_args, width, height, mask, frame_count)
+
+    if ok and frames > 0:
+        print(f"✅ Final video with audio: {output_video}")
+        return True
+    else:
+        print(f"❌ FFmpeg error:\n{stderr}")
+        return False
+
+def find_keyframes(input_video):
+    """Returns the presentation-order indices and timestamps of all video keyframes, plus the frame count."""
+    returncode, stdout, stderr = run_ffprobe([
+        "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", input_video
+    ])
+    if returncode != 0:
+        print(f"❌ ffprobe failed: {stderr}")
+        return None
+
+    packets = []
+    for line in stdout.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if pts_time and pts_time != "N/A":
+            packets.append((float(pts_time), "K" in flags))
+
+    if not packets:
+        return None
+
+    # Packets are in decode order; sort by timestamp to get presentation order.
+    # Times are made relative to the first frame because -ss already accounts for the stream start.
+    packets.sort()
+    first_pts = packets[0][0]
+    keyframes = [(i, pts_time - first_pts) for i, (pts_time, is_key) in enumerate(packets) if is_key]
+    return keyframes, len(packets)
+
+def plan_segments(keyframes, total_frames, workers):
+    """Splits the video into up to `workers` ranges that start on keyframes.
+
+    Returns a list of (start_time, frame_count) tuples.
+    """
+    # The first range always starts at the beginning, even if the first keyframe comes later,
+    # so no frames before it are lost
+    starts = [(0, 0.0)]
+    for i in range(1, workers):
+        target = i * total_frames / workers
+        index, pts_time = min(keyframes, key=lambda k: abs(k[0] - target))
+        if index > starts[-1][0]:
+            starts.append((index, pts_time))
+
+    segments = []
+    for n, (index, pts_time) in enumerate(starts):
+        end = starts[n + 1][0] if n + 1 < len(starts) else total_frames
+        segments.append((pts_time, end - index))
+    return segments
+
+def process_segment(job):
+    """Worker: masks one keyframe-aligned range of the input into a video-only segment."""
+    worker, input_video, segment_path, start_time, segment_frames, width, height, fps, center, radius = job
+    label = f" [worker {worker}]"
+
+    mask = build_circle_mask(width, height, center, radius)
+    reader_args = [
+        "-v", "error", "-ss", f"{start_time:.6f}", "-i", input_video,
+        "-frames:v", str(segment_frames),
+        "-an", "-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1"
+    ]
+    writer_args = [
+        "-v", "error",
+        "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", fps, "-i", "pipe:0",
+        *x264_args(), "-pix_fmt", "yuv420p",
+        "-an", "-y", segment_path
+    ]
+
+    start = time.perf_counter()
+    frames, ok, stderr = mask_frames(reader_args, writer_args, width, height, mask, segment_frames, label)
+    elapsed = time.perf_counter() - start
+
+    if not ok:
+        print(f"❌{label} FFmpeg error:\n{stderr}")
+    return {"worker": worker, "frames": frames, "expected": segment_frames,
+            "seconds": elapsed, "ok": ok and frames > 0}
+
+def crop_circular_video_parallel(input_video, output_video, center, radius, workers):
+    """Masks keyframe-aligned ranges in worker processes, then stitches them and remuxes the audio once."""
+    info = probe_video(input_video)
+    keyframe_info = find_keyframes(input_video)
+    if info is None or keyframe_info is None:
+        return False
+    width, height, fps, _ = info
+    keyframes, total_frames = keyframe_info
+
+    segments = plan_segments(keyframes, total_frames, workers)
+    print(f"🎥 Processing {total_frames} frames in {len(segments)} segments with {workers} workers...")
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_video))) as temp_dir:
+        jobs = [
+            (n, input_video, os.path.join(temp_dir, f"segment_{n:03d}.mp4"), start_time, segment_frames,
+             width, height, fps, center, radius)
+            for n, (start_time, segment_frames) in enumerate(segments)
+        ]
+
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            stats = list(pool.map(process_segment, jobs))
+        elapsed = time.perf_counter() - start
 
-    # Apply mask to keep only the circular area
-    cropped = cv2.bitwise_and(frame, mask)
+        # Throughput report for sizing the pool
+        print("📊 Worker report:")
+        for s in stats:
+            fps_rate = s["frames"] / s["seconds"] if s["seconds"] else 0
+            print(f"   worker {s['worker']}: {s['frames']}/{s['expected']} frames in {s['seconds']:.1f}s "
+                  f"({fps_rate:.1f} fps)")
+        total_processed = sum(s["frames"] for s in stats)
+        print(f"   total: {total_processed} frames in {elapsed:.1f}s ({total_processed / elapsed:.1f} fps)")
 
-    # Write the frame directly to the output video
-    out.write(cropped)
+        if not all(s["ok"] for s in stats):
+            print("❌ One or more segments failed.")
+            return False
 
-    frame_idx += 1
-    if frame_idx % 50 == 0:
-        print(f"[+] Processed {frame_idx}/{frame_count} frames...")
+        list_file = os.path.join(temp_dir, "segments.txt")
+        with open(list_file, "w", encoding="utf-8") as f:
+            for job in jobs:
+                f.write(f"file '{os.path.abspath(job[2]).replace(os.sep, '/')}'\n")
 
-# Release resources
-cap.release()
-out.release()
-cv2.destroyAllWindows()
+        # Stitch the segments losslessly and take the audio from the original in the same pass
+        print("🎬 Stitching segments and remuxing audio...")
+        stitch_args = [
+            "-f", "concat", "-safe", "0", "-i", list_file,
+            "-i", input_video,
+            "-map", "0:v", "-map", "1:a?",
+            "-c", "copy", "-shortest", "-y", output_video
+        ]
+        result = run_ffmpeg(stitch_args, label="stitch segments")
 
-print(f"✅ Successfully created circular cropped video: {TEMP_VIDEO}")
+    if result.ok:
+        print(f"✅ Final video with audio: {output_video}")
+        return True
+    else:
+        print(f"❌ FFmpeg error:\n{result.stderr}")
+        return False
 
-# ---- STEP 2: Extract Audio ----
-print("🔊 Extracting original audio...")
-ffmpeg_extract_audio = [
-    "ffmpeg", "-i", INPUT_VIDEO, "-vn", "-acodec", "copy", "-y", AUDIO_FILE
-]
-subprocess.run(ffmpeg_extract_audio, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-print(f"✅ Extracted audio: {AUDIO_FILE}")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crop the avatar video to a circle.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes; values above 1 process keyframe-aligned segments in parallel")
+    add_region_arguments(parser)
+    args = parser.parse_args()
 
-# ---- STEP 3: Merge Cropped Video with Audio ----
-print("🎬 Merging cropped video with audio...")
-ffmpeg_merge = [
-    "ffmpeg", "-i", TEMP_VIDEO, "-i", AUDIO_FILE,
-    "-c:v", "libx264", "-c:a", "aac", "-strict", "experimental", "-y", OUTPUT_VIDEO
-]
-subprocess.run(ffmpeg_merge, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    region = resolve_region(INPUT_VIDEO, args.roi, args.auto, args.avatar_id, args.refresh_roi)
+    if region:
+        selection = region_to_circle(region)
+    elif args.roi or args.auto:
+        print("❌ No crop region available for a non-interactive run. Exiting.")
+        exit(1)
+    else:
+        selection = select_circle(INPUT_VIDEO)
+    if selection is None:
+        exit()
 
-print(f"✅ Final video with audio: {OUTPUT_VIDEO}")
+    center, radius = selection
+    if args.workers > 1:
+        crop_circular_video_parallel(INPUT_VIDEO, OUTPUT_VIDEO, center, radius, args.workers)
+    else:
+        crop_circular_video(INPUT_VIDEO, OUTPUT_VIDEO, center, radius)
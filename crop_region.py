@@ -0,0 +1,179 @@
+import os
+import json
+import cv2
+
+# Cached regions, keyed by HeyGen avatar and video resolution
+CACHE_FILE = "./data/roi_cache.json"
+
+# HeyGen avatar used by Heygen_Avatar.py
+DEFAULT_AVATAR_ID = "Dexter_Doctor_Standing2_public"
+
+# Detection settings
+SAMPLE_FRAMES = 5  # Number of frames sampled across the video
+DETECT_WIDTH = 640  # Frames are downscaled to this width before running the cascades
+FACE_CASCADE = os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml")
+BODY_CASCADE = os.path.join(cv2.data.haarcascades, "haarcascade_upperbody.xml")
+
+def add_region_arguments(parser):
+    """Adds the shared non-interactive region flags to a crop script's argument parser."""
+    parser.add_argument("--roi", help="Crop region as 'x,y,width,height', a JSON object or a path to a JSON file")
+    parser.add_argument("--auto", action="store_true",
+                        help="Detect the avatar's face/torso instead of selecting the region with the mouse")
+    parser.add_argument("--avatar-id", default=DEFAULT_AVATAR_ID, help="HeyGen avatar id used as the cache key")
+    parser.add_argument("--refresh-roi", action="store_true", help="Ignore the cached region and detect again")
+
+def parse_region(spec):
+    """Parses a region spec ('x,y,w,h', JSON text or JSON file) into an (x, y, width, height) tuple."""
+    if os.path.exists(spec):
+        with open(spec, "r", encoding="utf-8") as f:
+            spec = f.read()
+
+    spec = spec.strip()
+    if spec.startswith("{") or spec.startswith("["):
+        data = json.loads(spec)
+        if isinstance(data, dict):
+            values = [data["x"], data["y"], data["width"], data["height"]]
+        else:
+            values = data
+    else:
+        values = spec.split(",")
+
+    if len(values) != 4:
+        raise ValueError(f"Expected 4 values (x, y, width, height), got: {spec}")
+    return tuple(int(v) for v in values)
+
+def clamp_region(region, frame_width, frame_height):
+    """Clips a region to the frame and rounds it to even sizes, as required by yuv420p encoding."""
+    x, y, w, h = region
+    # Trim the part that lies left of / above the frame instead of shifting the box
+    w += min(x, 0)
+    h += min(y, 0)
+    x = max(0, min(x, frame_width - 2))
+    y = max(0, min(y, frame_height - 2))
+    w = max(2, min(w, frame_width - x) // 2 * 2)
+    h = max(2, min(h, frame_height - y) // 2 * 2)
+    return x, y, w, h
+
+def region_to_circle(region):
+    """Converts a region to the (center, radius) of the circle through its corners.
+
+    Matches the circle crop_circular.py draws for a mouse drag between the same corners.
+    """
+    x, y, w, h = region
+    radius = int((w**2 + h**2) ** 0.5 / 2)
+    center = (x + w // 2, y + h // 2)
+    return center, radius
+
+def sample_frames(input_video, count=SAMPLE_FRAMES):
+    """Reads a handful of frames spread evenly across the video."""
+    cap = cv2.VideoCapture(input_video)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    positions = [int(frame_count * (i + 0.5) / count) for i in range(count)] if frame_count > 0 else [0]
+
+    frames = []
+    for position in positions:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+        ret, frame = cap.read()
+        if ret:
+            frames.append(frame)
+    cap.release()
+    return frames
+
+def detect_region(input_video, samples=SAMPLE_FRAMES):
+    """Detects the avatar's head and shoulders on sampled frames with the Haar cascades bundled with cv2."""
+    frames = sample_frames(input_video, samples)
+    if not frames:
+        print("❌ Error: Couldn't read the video file!")
+        return None
+
+    frame_height, frame_width = frames[0].shape[:2]
+    scale = min(1.0, DETECT_WIDTH / frame_width)
+    face_cascade = cv2.CascadeClassifier(FACE_CASCADE)
+    body_cascade = cv2.CascadeClassifier(BODY_CASCADE)
+
+    boxes = []
+    for frame in frames:
+        gray = cv2.cvtColor(cv2.resize(frame, None, fx=scale, fy=scale), cv2.COLOR_BGR2GRAY)
+        gray = cv2.equalizeHist(gray)
+
+        faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(40, 40))
+        if len(faces):
+            # Largest face, widened to include hair and shoulders
+            fx, fy, fw, fh = max(faces, key=lambda f: f[2] * f[3])
+            boxes.append((fx - 0.8 * fw, fy - 0.5 * fh, fx + 1.8 * fw, fy + 2.1 * fh))
+            continue
+
+        bodies = body_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=3, minSize=(60, 60))
+        if len(bodies):
+            bx, by, bw, bh = max(bodies, key=lambda b: b[2] * b[3])
+            boxes.append((bx, by, bx + bw, by + bh))
+
+    if not boxes:
+        print("❌ No face or torso detected in the sampled frames.")
+        return None
+
+    # Union over all samples so head movement stays inside the crop
+    x1 = min(b[0] for b in boxes) / scale
+    y1 = min(b[1] for b in boxes) / scale
+    x2 = max(b[2] for b in boxes) / scale
+    y2 = max(b[3] for b in boxes) / scale
+    region = clamp_region((int(x1), int(y1), int(x2 - x1), int(y2 - y1)), frame_width, frame_height)
+    print(f"🔍 Detected avatar region {region} in {len(boxes)}/{len(frames)} sampled frames.")
+    return region
+
+def video_resolution(input_video):
+    """Returns (width, height) of a video."""
+    cap = cv2.VideoCapture(input_video)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+    return width, height
+
+def cache_key(avatar_id, width, height):
+    return f"{avatar_id}@{width}x{height}"
+
+def load_cached_region(avatar_id, width, height, cache_file=CACHE_FILE):
+    if not os.path.exists(cache_file):
+        return None
+    with open(cache_file, "r", encoding="utf-8") as f:
+        region = json.load(f).get(cache_key(avatar_id, width, height))
+    return tuple(region) if region else None
+
+def save_cached_region(avatar_id, width, height, region, cache_file=CACHE_FILE):
+    cache = {}
+    if os.path.exists(cache_file):
+        with open(cache_file, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    cache[cache_key(avatar_id, width, height)] = list(region)
+
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    temp_file = f"{cache_file}.tmp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=4)
+    os.replace(temp_file, cache_file)
+
+def resolve_region(input_video, roi=None, auto=False, avatar_id=DEFAULT_AVATAR_ID, refresh=False):
+    """Returns the crop region without user interaction, or None if the caller should ask the user.
+
+    An explicit --roi spec wins. In auto mode the cached region for this avatar and
+    resolution is used if present; otherwise it is detected and cached.
+    """
+    width, height = video_resolution(input_video)
+
+    if roi:
+        return clamp_region(parse_region(roi), width, height)
+
+    if not auto:
+        return None
+
+    if not refresh:
+        region = load_cached_region(avatar_id, width, height)
+        if region:
+            print(f"⚡ Using cached region {region} for {cache_key(avatar_id, width, height)}")
+            return region
+
+    region = detect_region(input_video)
+    if region:
+        save_cached_region(avatar_id, width, height, region)
+        print(f"💾 Cached region for {cache_key(avatar_id, width, height)} in {CACHE_FILE}")
+    return region
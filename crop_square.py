@@ -1,13 +1,13 @@
 import cv2
 import numpy as np
 import os
-import subprocess
+import argparse
+from ffmpeg_runner import run_ffmpeg, x264_args
+from crop_region import add_region_arguments, resolve_region
 
 # Input and Output Paths
 INPUT_VIDEO = r"C:\Users\eprot\OneDrive - Hochschule Düsseldorf\Dokumente\Uni\6. Semester (NO)\CV and DL\automated-video-generation\data\avatar_video.mp4"
-TEMP_VIDEO = r"C:\Users\eprot\OneDrive - Hochschule Düsseldorf\Dokumente\Uni\6. Semester (NO)\CV and DL\automated-video-generation\data\temp_cropped.mp4"
 OUTPUT_VIDEO = r"C:\Users\eprot\OneDrive - Hochschule Düsseldorf\Dokumente\Uni\6. Semester (NO)\CV and DL\automated-video-generation\data\final_cropped_avatar.mp4"
-AUDIO_FILE = r"C:\Users\eprot\OneDrive - Hochschule Düsseldorf\Dokumente\Uni\6. Semester (NO)\CV and DL\automated-video-generation\data\original_audio.aac"
 
 # Global variables for cropping
 ref_point = []
@@ -30,56 +30,68 @@ def click_and_crop(event, x, y, flags, param):
         cv2.rectangle(preview, ref_point[0], ref_point[1], (255, 255, 255), 2)
         cv2.imshow("Select Crop Area", preview)
 
-# Open the video and grab the first frame for selection
-cap = cv2.VideoCapture(INPUT_VIDEO)
-ret, frame = cap.read()
-cap.release()
-
-if not ret:
-    print("❌ Error: Couldn't read the video file!")
-    exit()
-
-cv2.imshow("Select Crop Area", frame)
-cv2.setMouseCallback("Select Crop Area", click_and_crop)
-
-print("🖱️ Select the area with your mouse (click and drag to define a square) and press 'Enter' when done.")
-cv2.waitKey(0)
-cv2.destroyAllWindows()
-
-if len(ref_point) < 2:
-    print("❌ No selection made. Exiting.")
-    exit()
-
-# Get crop dimensions
-x1, y1 = ref_point[0]
-x2, y2 = ref_point[1]
-width = abs(x2 - x1)
-height = abs(y2 - y1)
-
-# ---- STEP 1: Crop Video ----
-print("✂️ Cropping video...")
-crop_cmd = [
-    "ffmpeg", "-i", INPUT_VIDEO,
-    "-vf", f"crop={width}:{height}:{min(x1, x2)}:{min(y1, y2)}",
-    "-c:v", "libx264", "-c:a", "aac", "-y", TEMP_VIDEO
-]
-subprocess.run(crop_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-print(f"✅ Cropped video saved to {TEMP_VIDEO}")
-
-# ---- STEP 2: Extract Original Audio ----
-print("🔊 Extracting original audio...")
-ffmpeg_extract_audio = [
-    "ffmpeg", "-i", INPUT_VIDEO, "-vn", "-acodec", "copy", "-y", AUDIO_FILE
-]
-subprocess.run(ffmpeg_extract_audio, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-print(f"✅ Extracted audio: {AUDIO_FILE}")
-
-# ---- STEP 3: Merge Cropped Video with Audio ----
-print("🎬 Merging cropped video with audio...")
-ffmpeg_merge = [
-    "ffmpeg", "-i", TEMP_VIDEO, "-i", AUDIO_FILE,
-    "-c:v", "libx264", "-c:a", "aac", "-strict", "experimental", "-y", OUTPUT_VIDEO
-]
-subprocess.run(ffmpeg_merge, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-print(f"✅ Final cropped video with audio: {OUTPUT_VIDEO}")
+def select_rectangle(input_video):
+    """ Lets the user drag a rectangle on the first frame and returns (x, y, width, height) """
+    global frame
+
+    # Open the video and grab the first frame for selection
+    cap = cv2.VideoCapture(input_video)
+    ret, frame = cap.read()
+    cap.release()
+
+    if not ret:
+        print("❌ Error: Couldn't read the video file!")
+        return None
+
+    cv2.imshow("Select Crop Area", frame)
+    cv2.setMouseCallback("Select Crop Area", click_and_crop)
+
+    print("🖱️ Select the area with your mouse (click and drag to define a square) and press 'Enter' when done.")
+    cv2.waitKey(0)
+    cv2.destroyAllWindows()
+
+    if len(ref_point) < 2:
+        print("❌ No selection made. Exiting.")
+        return None
+
+    # Get crop dimensions
+    x1, y1 = ref_point[0]
+    x2, y2 = ref_point[1]
+    return min(x1, x2), min(y1, y2), abs(x2 - x1), abs(y2 - y1)
+
+def crop_square_video(input_video, output_video, region):
+    """ Crops the video to the region and keeps the original audio in a single FFmpeg pass """
+    x, y, width, height = region
+
+    print("✂️ Cropping video...")
+    crop_args = [
+        "-i", input_video,
+        "-vf", f"crop={width}:{height}:{x}:{y}",
+        *x264_args(), "-pix_fmt", "yuv420p",
+        "-c:a", "copy",  # Original audio, no extract/merge round trip
+        "-y", output_video
+    ]
+    result = run_ffmpeg(crop_args, label="crop square")
+
+    if result.ok:
+        print(f"✅ Final cropped video with audio: {output_video}")
+        return True
+    else:
+        print(f"❌ FFmpeg error:\n{result.stderr}")
+        return False
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crop the avatar video to a rectangle.")
+    add_region_arguments(parser)
+    args = parser.parse_args()
+
+    region = resolve_region(INPUT_VIDEO, args.roi, args.auto, args.avatar_id, args.refresh_roi)
+    if region is None:
+        if args.roi or args.auto:
+            print("❌ No crop region available for a non-interactive run. Exiting.")
+            exit(1)
+        region = select_rectangle(INPUT_VIDEO)
+    if region is None:
+        exit()
+
+    crop_square_video(INPUT_VIDEO, OUTPUT_VIDEO, region)
@@ -0,0 +1,199 @@
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+import itertools
+from PyPDF2 import PdfReader
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+# Deck manifest: which PDF pages make up the slide timeline, in order.
+#
+# {
+#     "decks": [
+#         {"file": "Presentation1.pdf", "pages": "1-7,9-14", "durations": [23, 32, ...]},
+#         {"file": "Presentation2.pdf"}
+#     ]
+# }
+#
+# "file" is relative to the manifest. "pages" is optional (default: all pages) and
+# "durations" optional (seconds per selected page); slide2vid.slide_durations is used
+# when no deck gives durations. Pages are taken in the order listed ("13,12,14"), and a
+# file may appear in several entries to interleave decks.
+#
+# python deck_manifest.py checks the timeline against the split slides in data/slides.
+MANIFEST_FILE = "./data/decks.json"
+
+# Page attributes a page may inherit from its /Pages ancestors
+INHERITABLE_KEYS = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+# Keys that do not change how a page renders: document structure links, and stream encoding
+# (streams are hashed decoded), so a page hashes the same after being copied into another file
+SKIPPED_KEYS = {"/Parent", "/StructParents", "/StructParent"}
+STREAM_ENCODING_KEYS = {"/Length", "/Filter", "/DecodeParms"}
+
+def parse_page_ranges(spec, page_count):
+    """Turns a spec like "1-7,9,12-" into a list of 1-based page numbers. None or "" means all pages."""
+    if not spec:
+        return list(range(1, page_count + 1))
+
+    pages = []
+    for part in str(spec).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            first = int(first) if first.strip() else 1
+            last = int(last) if last.strip() else page_count
+        else:
+            first = last = int(part)
+        if not 1 <= first <= last <= page_count:
+            raise ValueError(f"Page range '{part}' is outside 1-{page_count}")
+        pages.extend(range(first, last + 1))
+    return pages
+
+def _update_hash(digest, obj, seen, counter):
+    """Feeds a canonical serialization of a PDF object tree into digest.
+
+    Indirect references are followed (each object once, so shared resources and
+    cycles are cheap) and /Parent links are skipped, so the hash only covers what
+    the page itself draws, not where it sits in the document.
+    """
+    ref = None
+    if isinstance(obj, IndirectObject):
+        ref = (obj.idnum, obj.generation)
+        if ref in seen:
+            digest.update(f"<ref {seen[ref]}>".encode())
+            return
+        obj = obj.get_object()
+
+    if isinstance(obj, (DictionaryObject, ArrayObject)):
+        # Every container is numbered in visiting order, direct or not, so the hash is
+        # independent of object numbers and of which objects a writer made indirect
+        number = next(counter)
+        if ref is not None:
+            seen[ref] = number
+
+    if isinstance(obj, DictionaryObject):
+        skipped = SKIPPED_KEYS | (STREAM_ENCODING_KEYS if isinstance(obj, StreamObject) else set())
+        digest.update(b"<<")
+        for key in sorted(obj.keys()):
+            if key in skipped:
+                continue
+            digest.update(key.encode("utf-8") + b" ")
+            _update_hash(digest, obj.raw_get(key), seen, counter)  # Unresolved, so references are tracked
+        digest.update(b">>")
+        if isinstance(obj, StreamObject):
+            data = obj.get_data()
+            digest.update(b"stream" + len(data).to_bytes(8, "big") + data)
+    elif isinstance(obj, ArrayObject):
+        digest.update(b"[")
+        for item in obj:
+            _update_hash(digest, item, seen, counter)
+        digest.update(b"]")
+    else:
+        digest.update(repr(obj).encode("utf-8") + b" ")
+
+def inherited(page, key):
+    """Returns a page attribute, looking it up in the /Pages ancestors if the page does not set it."""
+    node = page
+    while node is not None:
+        if key in node:
+            return node[key]
+        node = node.get("/Parent")
+        node = node.get_object() if node is not None else None
+    return None
+
+def page_hash(page, salt=""):
+    """Returns a hash of everything that determines how a page renders."""
+    digest = hashlib.sha256(salt.encode("utf-8"))
+    seen, counter = {}, itertools.count()
+    _update_hash(digest, page, seen, counter)
+    for key in INHERITABLE_KEYS:
+        if key not in page:
+            digest.update(key.encode("utf-8"))
+            _update_hash(digest, inherited(page, key), seen, counter)
+    return digest.hexdigest()[:32]
+
+def page_size(page):
+    """Returns the displayed (width, height) of a page in points, taking /Rotate into account."""
+    box = [float(v) for v in (inherited(page, "/CropBox") or inherited(page, "/MediaBox"))]
+    width, height = abs(box[2] - box[0]), abs(box[3] - box[1])
+    rotate = int(inherited(page, "/Rotate") or 0)
+    return (height, width) if rotate % 180 == 90 else (width, height)
+
+def load_manifest(manifest_file=MANIFEST_FILE, salt=""):
+    """Reads the deck manifest and returns its pages in order.
+
+    Each page is a dict with pdf (path), page (1-based number), size (points),
+    hash and duration (None if the deck gives no durations). The salt is mixed into
+    every hash, so render settings can be part of it.
+    """
+    with open(manifest_file, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_file))
+    pages = []
+    for deck in manifest["decks"]:
+        pdf_path = os.path.join(base_dir, deck["file"])
+        reader = PdfReader(pdf_path)
+        numbers = parse_page_ranges(deck.get("pages"), len(reader.pages))
+
+        durations = deck.get("durations")
+        if durations is not None and len(durations) != len(numbers):
+            raise ValueError(f"{deck['file']}: {len(durations)} durations for {len(numbers)} pages")
+
+        print(f"[+] {deck['file']}: {len(numbers)} of {len(reader.pages)} pages")
+        for i, number in enumerate(numbers):
+            page = reader.pages[number - 1]
+            pages.append({
+                "pdf": pdf_path,
+                "page": number,
+                "size": page_size(page),
+                "hash": page_hash(page, salt),
+                "duration": durations[i] if durations is not None else None,
+            })
+    return pages
+
+def read_durations(manifest_file=MANIFEST_FILE):
+    """Returns the slide durations listed in the manifest, or None unless every deck lists them."""
+    with open(manifest_file, "r", encoding="utf-8") as f:
+        decks = json.load(f)["decks"]
+    if any(deck.get("durations") is None for deck in decks):
+        return None
+    return [duration for deck in decks for duration in deck["durations"]]
+
+def check_slides(manifest_file=MANIFEST_FILE, slides_dir="./data/slides"):
+    """Compares the manifest's timeline with the split slides (slide_N.pdf, in number order).
+
+    Returns True if both have the same pages in the same order; prints every mismatch.
+    """
+    pages = load_manifest(manifest_file)
+    slide_files = sorted(
+        (f for f in os.listdir(slides_dir) if re.fullmatch(r"slide_\d+\.pdf", f)),
+        key=lambda f: int(re.search(r"\d+", f).group())
+    )
+    if len(slide_files) != len(pages):
+        print(f"❌ The manifest has {len(pages)} slides, {slides_dir} has {len(slide_files)}")
+        return False
+
+    ok = True
+    for position, (page, slide_file) in enumerate(zip(pages, slide_files), start=1):
+        slide_hash = page_hash(PdfReader(os.path.join(slides_dir, slide_file)).pages[0])
+        if slide_hash != page["hash"]:
+            print(f"❌ Slide {position}: manifest has {os.path.basename(page['pdf'])} page {page['page']}, "
+                  f"which differs from {slide_file}")
+            ok = False
+    if ok:
+        print(f"✅ The manifest matches the {len(pages)} slides in {slides_dir}")
+    return ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checks the deck manifest against the split slides.")
+    parser.add_argument("--manifest", default=MANIFEST_FILE)
+    parser.add_argument("--slides-dir", default="./data/slides")
+    args = parser.parse_args()
+
+    if not check_slides(args.manifest, args.slides_dir):
+        sys.exit(1)
@@ -0,0 +1,113 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024  # 200 MB
+
+class DiskCache:
+    """Content-addressed byte cache on disk with LRU eviction under a size cap.
+
+    Entries are files named by key. A file's modification time is its write time and
+    its access time is bumped on every hit, so the oldest atime is the least recently
+    used entry. With a ttl (seconds), entries older than that count as misses.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, ttl=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "expired": 0}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts):
+        """Hashes the parts that determine an entry's content into a cache key."""
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def get(self, key):
+        """Returns the cached bytes for key, or None on a miss."""
+        path = self._path(key)
+        now = time.time()
+        try:
+            stat = os.stat(path)
+            if self._expired(stat, now):
+                os.remove(path)
+                self._count("expired")
+                raise FileNotFoundError(path)
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path, (now, stat.st_mtime))  # Mark as recently used, keep the write time
+        except FileNotFoundError:
+            self._count("misses")
+            return None
+
+        self._count("hits")
+        return data
+
+    def _expired(self, stat, now):
+        return self.ttl is not None and now - stat.st_mtime > self.ttl
+
+    def put(self, key, data):
+        """Stores bytes under key and evicts least recently used entries beyond the size cap."""
+        path = self._path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+        self._count("writes")
+        self.evict()
+
+    def evict(self):
+        """Deletes expired entries, then the least recently used ones until the cache fits in max_bytes."""
+        now = time.time()
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                if name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                    if self._expired(stat, now):
+                        os.remove(os.path.join(self.directory, name))
+                        self.stats["expired"] += 1
+                        continue
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_atime, stat.st_size, name))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self.stats["evictions"] += 1
+
+    def size(self):
+        """Returns the total size of all entries in bytes."""
+        return sum(
+            os.path.getsize(os.path.join(self.directory, name))
+            for name in os.listdir(self.directory) if not name.endswith(".tmp")
+        )
+
+    def report(self, label="Cache"):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        hit_rate = self.stats["hits"] / lookups * 100 if lookups else 0
+        print(f"📦 {label}: {self.stats['hits']} hits, {self.stats['misses']} misses ({hit_rate:.0f}% hit rate), "
+              f"{self.stats['writes']} writes, {self.stats['evictions']} evictions, {self.stats['expired']} expired, "
+              f"{self.size() / 1024 / 1024:.1f} MB on disk")
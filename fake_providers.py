@@ -0,0 +1,322 @@
+import json
+import time
+import uuid
+import base64
+import random
+import argparse
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-ins for the provider APIs, for tests and load tests without API keys.
+# One server answers for all of them; point the app at it with the base URL variables:
+#
+#   OPENAI_BASE_URL=http://127.0.0.1:8001 GOOGLE_TTS_BASE_URL=http://127.0.0.1:8001
+#   D_ID_BASE_URL=http://127.0.0.1:8001 PICTORY_BASE_URL=http://127.0.0.1:8001
+#
+# Latency, random server errors and 429 rate limiting are configurable per run.
+
+DEFAULT_PORT = 8001
+TOKEN_DELAY = 0.02  # Seconds between streamed tokens, roughly the pace of gpt-4o
+
+# Endpoint path prefix -> provider, for latency, rate limits and stats
+PROVIDER_PATHS = {
+    "/v1/chat/completions": "openai",
+    "/v1/text:synthesize": "google_tts",
+    "/talks": "d_id",
+    "/v1/generate-video": "pictory",
+}
+# Response time per provider in seconds, before jitter; streamed chat completions use TOKEN_DELAY instead
+LATENCY = {"openai": 1.0, "google_tts": 0.3, "d_id": 2.0, "pictory": 3.0}
+JITTER = 0.2  # Latencies vary uniformly by +/- this fraction
+MAX_TALKS = 5000  # D-ID talks kept for GET /talks/<id>; the oldest are forgotten, so long load tests don't grow memory
+ERROR_STATUSES = (500, 502, 503)  # Picked at random for injected errors
+RETRY_AFTER = 1  # Seconds, sent with every 429
+
+# Silent MPEG-2 Layer III frame, 24 kHz mono 32 kbit/s like Google TTS MP3 output: header, then all-zero
+# side info and main data, which decodes to silence. 576 samples, so 24 ms per frame.
+SILENT_MP3_FRAME = bytes([0xFF, 0xF3, 0x44, 0xC0]) + bytes(92)
+MP3_FRAME_SECONDS = 576 / 24000
+SPOKEN_CHARS_PER_SECOND = 15  # Rough speaking pace at speakingRate 1.0
+MEDIA_SIZE = 2 * 1024 * 1024  # Bytes of the placeholder video served without --media-file
+MEDIA_CHUNK_SIZE = 64 * 1024
+
+FAKE_SCRIPT = (
+    "((Slide 1)) Hello everyone, and welcome to this short introduction to recurrent neural networks. "
+    "Today we look at how they process sequences, one step at a time.\n\n"
+    "((Slide 2)) An RNN keeps a hidden state that summarizes everything it has seen so far. "
+    "At every step, the new input and the previous state are combined into the next state. "
+    "This simple idea lets the same weights handle sequences of any length.\n\n"
+    "((Slide 3)) Plain RNNs struggle with long-range dependencies, because gradients vanish over many steps. "
+    "LSTMs and GRUs add gates that decide what to keep and what to forget. "
+    "((pause)) That makes them far better at remembering information over long spans.\n\n"
+    "((Slide 4)) Finally, attention lets the model look back at every earlier step directly. "
+    "Thank you for watching, and see you in the next lecture!"
+)
+
+def tokenize(text):
+    """Splits text into word-sized pieces with their leading whitespace, like streamed tokens."""
+    tokens, start = [], 0
+    for i in range(1, len(text) + 1):
+        if i == len(text) or (text[i] in " \n" and text[i - 1] not in " \n"):
+            tokens.append(text[start:i])
+            start = i
+    return tokens
+
+def silent_mp3(seconds):
+    """Returns that many seconds of silent MP3 frames."""
+    return SILENT_MP3_FRAME * max(1, round(seconds / MP3_FRAME_SECONDS))
+
+def placeholder_mp4(size=MEDIA_SIZE):
+    """Returns size bytes that start like an MP4 file (an ftyp box), for download tests."""
+    ftyp = (24).to_bytes(4, "big") + b"ftypisom" + (512).to_bytes(4, "big") + b"isommp41"
+    return ftyp + bytes(max(0, size - len(ftyp)))
+
+class RateLimiter:
+    """Token bucket per provider: rate requests per second with bursts of up to rate requests.
+
+    The bucket holds at least one token, so rates below one request per second still let requests through.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self.buckets = {}  # provider -> (tokens, last refill)
+        self._lock = threading.Lock()
+
+    def allow(self, provider):
+        if not self.rate:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self.buckets.get(provider, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1
+            self.buckets[provider] = (tokens - 1 if allowed else tokens, now)
+        return allowed
+
+class ProviderStats:
+    """Counts responses per provider and status, served at GET /stats."""
+
+    def __init__(self):
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def add(self, provider, status):
+        with self._lock:
+            key = f"{provider} {status}"
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(sorted(self.counts.items()))
+
+class TalkStore:
+    """Result URLs of the most recent D-ID talks, for GET /talks/<id>."""
+
+    def __init__(self, max_talks=MAX_TALKS):
+        self.max_talks = max_talks
+        self.talks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, talk_id, result_url):
+        with self._lock:
+            self.talks[talk_id] = result_url
+            while len(self.talks) > self.max_talks:
+                self.talks.popitem(last=False)
+
+    def get(self, talk_id):
+        with self._lock:
+            return self.talks.get(talk_id)
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real APIs
+    token_delay = TOKEN_DELAY
+    script = FAKE_SCRIPT
+    latency = LATENCY
+    jitter = JITTER
+    error_rate = 0.0  # Fraction of API requests answered with a random ERROR_STATUSES error
+    rate_limiter = RateLimiter(0)
+    stats = ProviderStats()
+    media = placeholder_mp4()
+    talks = TalkStore()
+
+    def log_message(self, format, *args):
+        pass  # Keep the console quiet during load tests
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def send_json(self, body, status=200, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    @property
+    def base_url(self):
+        return f"http://{self.headers.get('Host', '127.0.0.1')}"
+
+    def provider(self):
+        return next((name for prefix, name in PROVIDER_PATHS.items() if self.path.startswith(prefix)), None)
+
+    def simulate(self, provider, delay=True):
+        """Applies rate limiting, injected errors and latency. Returns False if an error was sent instead."""
+        if not self.rate_limiter.allow(provider):
+            self.stats.add(provider, 429)
+            self.send_json({"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                           status=429, headers={"Retry-After": str(RETRY_AFTER)})
+            return False
+        if self.error_rate and random.random() < self.error_rate:
+            status = random.choice(ERROR_STATUSES)
+            self.stats.add(provider, status)
+            self.send_json({"error": {"message": "Injected server error"}}, status=status)
+            return False
+
+        latency = self.latency.get(provider, 0) if delay else 0
+        time.sleep(max(0.0, latency * random.uniform(1 - self.jitter, 1 + self.jitter)))
+        self.stats.add(provider, 200)
+        return True
+
+    def do_POST(self):
+        provider = self.provider()
+        payload = self.read_json()  # Read before answering, so the connection can be kept alive
+        if provider is None:
+            self.send_json({"error": f"Unknown endpoint {self.path}"}, status=404)
+            return
+        # Streams pace themselves per token, so only the limits and errors apply to them up front
+        if not self.simulate(provider, delay=not payload.get("stream")):
+            return
+
+        if provider == "openai":
+            self.chat_completion(payload)
+        elif provider == "google_tts":
+            self.synthesize(payload)
+        elif provider == "d_id":
+            self.create_talk(payload)
+        else:
+            self.generate_video(payload)
+
+    def do_GET(self):
+        if self.path.startswith("/media/"):
+            self.send_media()
+        elif self.path.startswith("/talks/"):
+            talk_id = self.path.rsplit("/", 1)[1]
+            result_url = self.talks.get(talk_id)
+            if result_url is None:
+                self.send_json({"kind": "NotFoundError", "description": "talk not found"}, status=404)
+            else:
+                self.send_json({"id": talk_id, "status": "done", "result_url": result_url})
+        elif self.path == "/stats":
+            self.send_json(self.stats.snapshot())
+        else:
+            self.send_json({"error": f"Unknown endpoint {self.path}"}, status=404)
+
+    def synthesize(self, payload):
+        """Google TTS: base64 MP3 of silence, as long as the text would take to speak."""
+        text = payload.get("input", {}).get("text", "")
+        speed = payload.get("audioConfig", {}).get("speakingRate", 1.0) or 1.0
+        audio = silent_mp3(len(text) / SPOKEN_CHARS_PER_SECOND / speed)
+        self.send_json({"audioContent": base64.b64encode(audio).decode("ascii")})
+
+    def create_talk(self, payload):
+        """D-ID: the talk is rendered at once, so the result URL comes with the creation response."""
+        talk_id = f"tlk_{uuid.uuid4().hex[:20]}"
+        result_url = f"{self.base_url}/media/{talk_id}.mp4"
+        self.talks.add(talk_id, result_url)
+        self.send_json({"id": talk_id, "object": "talk", "status": "done", "result_url": result_url}, status=201)
+
+    def generate_video(self, payload):
+        """Pictory: a finished job with the URL of its video."""
+        job_id = uuid.uuid4().hex
+        self.send_json({"success": True, "job_id": job_id, "status": "completed",
+                        "video_url": f"{self.base_url}/media/{job_id}.mp4"})
+
+    def send_media(self):
+        """Serves the media file for every /media/ URL, streamed in chunks like a CDN download."""
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(len(self.media)))
+        self.end_headers()
+        view = memoryview(self.media)
+        for start in range(0, len(view), MEDIA_CHUNK_SIZE):
+            self.wfile.write(view[start:start + MEDIA_CHUNK_SIZE])
+
+    def chat_completion(self, payload):
+        if not payload.get("stream"):
+            self.send_json({"choices": [{"index": 0, "message": {"role": "assistant", "content": self.script},
+                                         "finish_reason": "stop"}]})
+            return
+
+        # Server-sent events, one chunk per token, ended by [DONE] like the OpenAI API
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send_event(data):
+            event = f"data: {data}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(event):X}\r\n".encode("ascii") + event + b"\r\n")
+            self.wfile.flush()
+
+        for token in tokenize(self.script):
+            time.sleep(self.token_delay)
+            send_event(json.dumps({"choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}))
+        send_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+def serve(port=DEFAULT_PORT, token_delay=TOKEN_DELAY, latency=None, jitter=JITTER, error_rate=0.0, rate_limit=0,
+          media_file=None):
+    """Creates the fake provider server; call serve_forever() on the result.
+
+    latency overrides LATENCY per provider, rate_limit is requests per second per provider
+    (0: unlimited) and media_file, if given, is served for every video URL.
+    """
+    FakeProviderHandler.token_delay = token_delay
+    FakeProviderHandler.latency = {**LATENCY, **(latency or {})}
+    FakeProviderHandler.jitter = jitter
+    FakeProviderHandler.error_rate = error_rate
+    FakeProviderHandler.rate_limiter = RateLimiter(rate_limit)
+    FakeProviderHandler.stats = ProviderStats()
+    FakeProviderHandler.talks = TalkStore()
+    if media_file:
+        with open(media_file, "rb") as f:
+            FakeProviderHandler.media = f.read()
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeProviderHandler)
+    server.daemon_threads = True
+    print(f"🧪 Fake providers listening on http://127.0.0.1:{port}")
+    return server
+
+def parse_latency(spec):
+    """Parses PROVIDER=SECONDS, e.g. d_id=2.5."""
+    provider, _, seconds = spec.partition("=")
+    if provider not in LATENCY or not seconds:
+        raise argparse.ArgumentTypeError(f"Expected PROVIDER=SECONDS with PROVIDER one of {', '.join(LATENCY)}")
+    return provider, float(seconds)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs local fake provider APIs.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--token-delay", type=float, default=TOKEN_DELAY, help="Seconds between streamed tokens")
+    parser.add_argument("--latency", type=parse_latency, nargs="+", default=[], metavar="PROVIDER=SECONDS",
+                        help=f"Response time per provider (defaults: "
+                             f"{', '.join(f'{name}={seconds:g}' for name, seconds in LATENCY.items())})")
+    parser.add_argument("--jitter", type=float, default=JITTER, help="Relative latency variation")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with a 5xx")
+    parser.add_argument("--rate-limit", type=float, default=0, help="Requests per second per provider before 429s")
+    parser.add_argument("--media-file", help="Video served for the D-ID and Pictory result URLs")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.token_delay, dict(args.latency), args.jitter, args.error_rate, args.rate_limit,
+                   args.media_file)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"📊 Responses: {json.dumps(FakeProviderHandler.stats.snapshot())}")
@@ -0,0 +1,177 @@
+import os
+import time
+import threading
+import subprocess
+from collections import deque
+
+# One place to run FFmpeg/ffprobe: encoder presets, progress events, timeouts and timings.
+
+# x264 speed/quality presets; pick one with FFMPEG_PRESET or per call
+PRESETS = {
+    "fast": {"preset": "veryfast", "crf": 23, "threads": 0},  # Drafts and tests
+    "balanced": {"preset": "medium", "crf": 21, "threads": 0},  # libx264's defaults, slightly sharper
+    "quality": {"preset": "slow", "crf": 18, "threads": 0},  # Final renders
+}
+DEFAULT_PRESET = os.getenv("FFMPEG_PRESET", "balanced")
+DEFAULT_TIMEOUT = float(os.getenv("FFMPEG_TIMEOUT", "3600"))  # Seconds per invocation
+PROBE_TIMEOUT = 60
+STDERR_TAIL_LINES = 40  # Only the end of FFmpeg's log is kept for error messages
+PROGRESS_PRINT_INTERVAL = 10.0  # Seconds between progress lines when no callback is given
+
+# Keys FFmpeg writes with -progress; every block ends with progress=continue|end
+PROGRESS_KEYS = {"frame", "fps", "bitrate", "total_size", "out_time_us", "out_time_ms", "out_time",
+                 "dup_frames", "drop_frames", "speed", "progress"}
+
+_timings = []
+_timings_lock = threading.Lock()
+
+def x264_args(preset=None):
+    """Returns the libx264 encoder arguments of a named preset."""
+    settings = PRESETS[preset or DEFAULT_PRESET]
+    return ["-c:v", "libx264", "-preset", settings["preset"], "-crf", str(settings["crf"]),
+            "-threads", str(settings["threads"])]
+
+def parse_progress(block):
+    """Turns one block of -progress key=value pairs into an event with numeric fields."""
+    event = {"progress": block.get("progress")}
+    for key, convert in (("frame", int), ("fps", float), ("drop_frames", int), ("dup_frames", int)):
+        try:
+            event[key] = convert(block[key])
+        except (KeyError, ValueError):
+            pass
+    try:
+        event["out_time"] = int(block["out_time_us"]) / 1_000_000
+    except (KeyError, ValueError):
+        pass
+    speed = block.get("speed", "").rstrip("x")
+    try:
+        event["speed"] = float(speed)
+    except ValueError:
+        pass
+    return event
+
+class FFmpegResult:
+    """Outcome of one FFmpeg invocation."""
+
+    def __init__(self, label, returncode, stderr, seconds, progress, timed_out=False):
+        self.label = label
+        self.returncode = returncode
+        self.stderr = stderr  # Last STDERR_TAIL_LINES lines of the log
+        self.seconds = seconds
+        self.progress = progress  # Last progress event, {} if there was none
+        self.timed_out = timed_out
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and not self.timed_out
+
+class FFmpegProcess:
+    """A running FFmpeg process whose progress is parsed while it runs.
+
+    Progress goes to stderr (-progress pipe:2), so stdin and stdout stay free for
+    pipes; the log lines around it are kept in a bounded tail.
+    """
+
+    def __init__(self, args, label="ffmpeg", timeout=DEFAULT_TIMEOUT, on_progress=None,
+                 stdin=None, stdout=subprocess.DEVNULL):
+        self.label = label
+        self.timeout = timeout
+        self.on_progress = on_progress or self._print_progress
+        self.command = ["ffmpeg", "-hide_banner", "-nostats", "-progress", "pipe:2"] + list(args)
+        self.tail = deque(maxlen=STDERR_TAIL_LINES)
+        self.last_progress = {}
+        self._last_print = 0.0
+        self.started = time.perf_counter()
+        # Binary pipes: stdout may carry raw frames, and stderr is decoded line by line
+        self.process = subprocess.Popen(self.command, stdin=stdin, stdout=stdout, stderr=subprocess.PIPE)
+        self._reader = threading.Thread(target=self._read_stderr, daemon=True)
+        self._reader.start()
+        # The watchdog enforces the timeout even while the caller is blocked on a pipe and not in wait()
+        self._timed_out = threading.Event()
+        self._watchdog = None
+        if timeout is not None:
+            self._watchdog = threading.Timer(timeout, self._kill_on_timeout)
+            self._watchdog.daemon = True
+            self._watchdog.start()
+
+    @property
+    def stdin(self):
+        return self.process.stdin
+
+    @property
+    def stdout(self):
+        return self.process.stdout
+
+    def _kill_on_timeout(self):
+        if self.process.poll() is None:
+            self._timed_out.set()
+            self.process.kill()
+            print(f"❌ {self.label}: FFmpeg timed out after {self.timeout:g}s and was killed")
+
+    def _read_stderr(self):
+        block = {}
+        for raw in iter(self.process.stderr.readline, b""):
+            line = raw.decode("utf-8", errors="replace").rstrip()
+            key, sep, value = line.partition("=")
+            if sep and key in PROGRESS_KEYS:
+                block[key] = value.strip()
+                if key == "progress":
+                    self.last_progress = parse_progress(block)
+                    self.on_progress(self.last_progress)
+                    block = {}
+            elif line:
+                self.tail.append(line)
+
+    def _print_progress(self, event):
+        now = time.perf_counter()
+        if event.get("progress") != "end" and now - self._last_print < PROGRESS_PRINT_INTERVAL:
+            return
+        self._last_print = now
+        print(f"⏳ {self.label}: {event.get('out_time', 0):.1f}s written, "
+              f"{event.get('fps', 0):.1f} fps, {event.get('speed', 0):.2f}x")
+
+    def wait(self):
+        """Waits for FFmpeg to exit; the watchdog kills it when the timeout passes. Returns an FFmpegResult."""
+        self.process.wait()
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+        timed_out = self._timed_out.is_set()
+        self._reader.join()
+
+        seconds = time.perf_counter() - self.started
+        result = FFmpegResult(self.label, self.process.returncode, "\n".join(self.tail), seconds,
+                              self.last_progress, timed_out)
+        with _timings_lock:
+            _timings.append((self.label, seconds, result.ok))
+        print(f"⏱️ {self.label}: {seconds:.1f}s")
+        return result
+
+def run_ffmpeg(args, label="ffmpeg", timeout=DEFAULT_TIMEOUT, on_progress=None):
+    """Runs FFmpeg with the given arguments (without the program name) to completion. Returns an FFmpegResult."""
+    return FFmpegProcess(args, label, timeout, on_progress).wait()
+
+def run_ffprobe(args, timeout=PROBE_TIMEOUT):
+    """Runs ffprobe. Returns (returncode, stdout, stderr) as text; returncode is None on timeout."""
+    try:
+        result = subprocess.run(["ffprobe"] + list(args), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return None, "", f"ffprobe timed out after {timeout}s"
+    return result.returncode, result.stdout.decode("utf-8", errors="replace"), result.stderr.decode("utf-8", errors="replace")
+
+def timings():
+    """Returns (label, seconds, ok) for every FFmpeg invocation of this process so far."""
+    with _timings_lock:
+        return list(_timings)
+
+def report_timings():
+    """Prints the total FFmpeg time per label, slowest first."""
+    totals = {}
+    for label, seconds, _ in timings():
+        count, total = totals.get(label, (0, 0.0))
+        totals[label] = (count + 1, total + seconds)
+    if not totals:
+        return
+    print("📊 FFmpeg time by step:")
+    for label, (count, total) in sorted(totals.items(), key=lambda item: -item[1][1]):
+        print(f"   {label}: {total:.1f}s over {count} run{'s' if count != 1 else ''}")
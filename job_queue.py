@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import uuid
+import socket
+import contextlib
+import sqlite3
+import threading
+import traceback
+
+# SQLite file that holds the queue; it survives restarts of the server
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "./data/jobs.sqlite3")
+POLL_INTERVAL = 1.0  # Seconds an idle worker waits before checking the queue again
+# Running jobs carry the id of the worker pool that claimed them and a heartbeat it renews.
+# Only jobs whose heartbeat is older than HEARTBEAT_TIMEOUT are re-queued, so several server
+# processes can share one database without taking over each other's live jobs.
+HEARTBEAT_INTERVAL = 10.0  # Seconds
+HEARTBEAT_TIMEOUT = 60.0  # Seconds without a heartbeat after which a running job counts as interrupted
+
+class JobQueue:
+    """Persistent job queue backed by a local SQLite database.
+
+    Jobs move from queued -> running -> done / failed. Each job keeps a per-stage
+    status map so clients can follow its progress.
+    """
+
+    def __init__(self, path=JOB_DB_PATH, stages=()):
+        self.path = path
+        self.stages = list(stages)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    stages TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    worker TEXT,
+                    heartbeat_at REAL
+                )
+            """)
+            # Databases created before heartbeats existed
+            columns = {row[1] for row in db.execute("PRAGMA table_info(jobs)")}
+            for column, column_type in (("worker", "TEXT"), ("heartbeat_at", "REAL")):
+                if column not in columns:
+                    db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # Autocommit mode; multi-statement updates use explicit BEGIN IMMEDIATE transactions
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def submit(self, params):
+        """Adds a job to the queue and returns its id."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        stages = {stage: "pending" for stage in self.stages}
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, status, params, stages, created_at, updated_at) VALUES (?, 'queued', ?, ?, ?, ?)",
+                (job_id, json.dumps(params), json.dumps(stages), now, now)
+            )
+        return job_id
+
+    def claim(self, worker):
+        """Atomically takes the oldest queued job for a worker. Returns (job_id, params) or None if the queue is empty."""
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT id, params FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            now = time.time()
+            db.execute("UPDATE jobs SET status = 'running', worker = ?, heartbeat_at = ?, updated_at = ? WHERE id = ?",
+                       (worker, now, now, row[0]))
+            db.execute("COMMIT")
+        return row[0], json.loads(row[1])
+
+    # set_stage, complete and fail only touch a job while the given worker still owns it, so a
+    # worker whose job was re-queued and claimed again cannot overwrite the new run. They return
+    # False when the job belongs to someone else.
+
+    def set_stage(self, job_id, worker, stage, status):
+        """Records the status of one stage of a job (pending, running, done or failed)."""
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute("SELECT stages FROM jobs WHERE id = ? AND worker = ?", (job_id, worker)).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return False
+            stages = json.loads(row[0])
+            stages[stage] = status
+            db.execute("UPDATE jobs SET stages = ?, updated_at = ? WHERE id = ? AND worker = ?",
+                       (json.dumps(stages), time.time(), job_id, worker))
+            db.execute("COMMIT")
+        return True
+
+    def complete(self, job_id, worker, result):
+        with self._connect() as db:
+            cursor = db.execute("UPDATE jobs SET status = 'done', result = ?, updated_at = ? WHERE id = ? AND worker = ?",
+                                (json.dumps(result), time.time(), job_id, worker))
+            return cursor.rowcount > 0
+
+    def fail(self, job_id, worker, error):
+        with self._connect() as db:
+            cursor = db.execute("UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE id = ? AND worker = ?",
+                                (error, time.time(), job_id, worker))
+            return cursor.rowcount > 0
+
+    def heartbeat(self, worker):
+        """Marks the running jobs of a worker as alive."""
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET heartbeat_at = ? WHERE status = 'running' AND worker = ?", (time.time(), worker))
+
+    def requeue_interrupted(self, timeout=HEARTBEAT_TIMEOUT):
+        """Puts running jobs whose worker stopped sending heartbeats back into the queue."""
+        now = time.time()
+        with self._connect() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL, heartbeat_at = NULL, updated_at = ? "
+                "WHERE status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+                (now, now - timeout)
+            )
+            return cursor.rowcount
+
+    def get(self, job_id):
+        """Returns a job as a dict, or None if it does not exist."""
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT id, status, params, stages, result, error, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        stages = json.loads(row[3])
+        return {
+            "id": row[0],
+            "status": row[1],
+            "params": json.loads(row[2]),
+            "stages": stages,
+            "progress": sum(status == "done" for status in stages.values()) / len(stages) if stages else 0.0,
+            "result": json.loads(row[4]) if row[4] else None,
+            "error": row[5],
+            "created_at": row[6],
+            "updated_at": row[7],
+        }
+
+class WorkerPool:
+    """Threads that take jobs from a JobQueue and run them through a handler.
+
+    The handler is called as handler(params, report), where report(stage, status)
+    updates the job's stage map. Its return value becomes the job result.
+    """
+
+    def __init__(self, queue, handler, workers=1):
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._requeue_interrupted()
+
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"video-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat, name="video-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        print(f"👷 Started {self.workers} video workers ({self.worker_id})")
+
+    def _requeue_interrupted(self):
+        requeued = self.queue.requeue_interrupted()
+        if requeued:
+            print(f"🔁 Re-queued {requeued} interrupted jobs")
+
+    def _heartbeat(self):
+        # Keeps this pool's jobs alive and picks up the jobs of processes that died
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                self.queue.heartbeat(self.worker_id)
+                self._requeue_interrupted()
+            except sqlite3.Error as e:
+                # E.g. "database is locked" under load; the next beat comes well before HEARTBEAT_TIMEOUT
+                print(f"⚠️ Heartbeat failed: {e}")
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self):
+        while not self._stop.is_set():
+            job = self.queue.claim(self.worker_id)
+            if job is None:
+                self._stop.wait(POLL_INTERVAL)
+                continue
+
+            job_id, params = job
+            current = {}
+
+            def report(stage, status):
+                current["stage"] = stage
+                self.queue.set_stage(job_id, self.worker_id, stage, status)
+
+            print(f"▶️ Job {job_id} started")
+            try:
+                result = self.handler(params, report)
+            except Exception as e:
+                if "stage" in current:
+                    self.queue.set_stage(job_id, self.worker_id, current["stage"], "failed")
+                owned = self.queue.fail(job_id, self.worker_id, f"{type(e).__name__}: {e}")
+                if owned:
+                    print(f"❌ Job {job_id} failed:\n{traceback.format_exc()}")
+            else:
+                owned = self.queue.complete(job_id, self.worker_id, result)
+                if owned:
+                    print(f"✅ Job {job_id} done")
+            if not owned:
+                print(f"⚠️ Job {job_id} was re-queued and taken over by another worker; this run's outcome was discarded")
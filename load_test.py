@@ -0,0 +1,186 @@
+import sys
+import json
+import math
+import time
+import argparse
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+# Load generator for the FastAPI app. Virtual users submit /generate_video/ jobs in a closed
+# loop at the target concurrency and follow each job until it finishes. Run it against the
+# app started on fake providers, without an editor:
+#
+#   python fake_providers.py --latency d_id=2 pictory=3 --error-rate 0.01 --rate-limit 20
+#   OPENAI_BASE_URL=http://127.0.0.1:8001 GOOGLE_TTS_BASE_URL=http://127.0.0.1:8001 \
+#   D_ID_BASE_URL=http://127.0.0.1:8001 PICTORY_BASE_URL=http://127.0.0.1:8001 \
+#   EDITOR_BACKEND=none uvicorn main:app --port 8000
+#   python load_test.py --requests 200 --concurrency 20 --fakes-url http://127.0.0.1:8001
+
+BASE_URL = "http://127.0.0.1:8000"
+DEFAULT_REQUESTS = 100
+DEFAULT_CONCURRENCY = 10
+POLL_INTERVAL = 0.5  # Seconds between job status checks
+JOB_TIMEOUT = 600  # Seconds a job may take before it counts as timed out
+REQUEST_TIMEOUT = 30
+
+# Form fields of a generate request; the topic is made unique per request so the GPT cache does not answer
+FORM = {
+    "voice": "en-US-Standard-D",
+    "emotion": "neutral",
+    "speed": "1.0",
+    "length": "60",
+    "avatar_gender": "female",
+    "avatar_skin_color": "medium",
+    "avatar_hair": "brown",
+    "avatar_eyes": "brown",
+}
+
+def percentile(values, p):
+    """Nearest-rank percentile of a list of numbers, None for an empty list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+def create_session(pool_size):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def wait_for_job(session, base_url, status_url, timeout=JOB_TIMEOUT):
+    """Polls a job until it is done or failed. Returns its last status document, or None on timeout."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        response = session.get(f"{base_url}{status_url}", timeout=REQUEST_TIMEOUT)
+        if response.ok:
+            job = response.json()
+            if job["status"] in ("done", "failed"):
+                return job
+        time.sleep(POLL_INTERVAL)
+    return None
+
+def run_request(session, base_url, n, same_topic=False, wait=True):
+    """One virtual user iteration: submits a job and, with wait, follows it to the end."""
+    topic = "Recurrent neural networks" if same_topic else f"Load test topic {n}"
+    result = {"n": n}
+    started = time.perf_counter()
+    try:
+        response = session.post(f"{base_url}/generate_video/", data={**FORM, "topic": topic}, timeout=REQUEST_TIMEOUT)
+    except requests.RequestException as e:
+        result.update({"submit_status": type(e).__name__, "submit_seconds": time.perf_counter() - started})
+        return result
+
+    result.update({"submit_status": response.status_code, "submit_seconds": time.perf_counter() - started})
+    if response.status_code != 202 or not wait:
+        return result
+
+    try:
+        job = wait_for_job(session, base_url, response.json()["status_url"])
+    except requests.RequestException as e:
+        result["job_status"] = f"poll error: {type(e).__name__}"
+        return result
+
+    if job is None:
+        result["job_status"] = "timed out"
+        return result
+    result.update({
+        "job_status": job["status"],
+        "job_seconds": job["updated_at"] - job["created_at"],  # Server clock: queue wait plus processing
+        "error": job.get("error"),
+        "stages": job.get("stages"),
+    })
+    return result
+
+def summarize(results, elapsed):
+    """Turns the per-request results into latency percentiles, throughput and error counts."""
+    submit_seconds = [r["submit_seconds"] for r in results if r["submit_status"] == 202]
+    job_seconds = [r["job_seconds"] for r in results if r.get("job_status") == "done"]
+    errors = Counter((r.get("error") or "")[:120] for r in results if r.get("job_status") == "failed")
+    failed_stages = Counter(stage for r in results if r.get("job_status") == "failed"
+                            for stage, status in (r.get("stages") or {}).items() if status == "failed")
+    return {
+        "requests": len(results),
+        "seconds": elapsed,
+        "submit_status": dict(Counter(str(r["submit_status"]) for r in results)),
+        "job_status": dict(Counter(r["job_status"] for r in results if "job_status" in r)),
+        "submit_latency": {f"p{p}": percentile(submit_seconds, p) for p in (50, 95, 99)},
+        "job_latency": {f"p{p}": percentile(job_seconds, p) for p in (50, 95, 99)},
+        "submit_throughput": len(submit_seconds) / elapsed if elapsed else 0,
+        "job_throughput": len(job_seconds) / elapsed if elapsed else 0,
+        "failed_stages": dict(failed_stages),
+        "errors": dict(errors.most_common(5)),
+    }
+
+def format_latency(latency):
+    return "  ".join(f"{name} {'-' if seconds is None else f'{seconds * 1000:.0f} ms'}" for name, seconds in latency.items())
+
+def print_summary(summary, wait=True):
+    print(f"📊 {summary['requests']} requests in {summary['seconds']:.1f}s")
+    print(f"   submit status: {summary['submit_status']}")
+    print(f"   submit latency: {format_latency(summary['submit_latency'])}")
+    print(f"   submit throughput: {summary['submit_throughput']:.2f} req/s")
+    if not wait:
+        return
+    print(f"   job status: {summary['job_status']}")
+    print(f"   job latency: {format_latency(summary['job_latency'])}")
+    print(f"   job throughput: {summary['job_throughput']:.2f} jobs/s")
+    if summary["failed_stages"]:
+        print(f"   failed stages: {summary['failed_stages']}")
+    for error, count in summary["errors"].items():
+        print(f"   ❌ {count}x {error}")
+
+def load_test(base_url=BASE_URL, total=DEFAULT_REQUESTS, concurrency=DEFAULT_CONCURRENCY, same_topic=False, wait=True):
+    """Drives total requests at the given concurrency. Returns the summary."""
+    session = create_session(concurrency)
+    progress = Counter()
+    progress_lock = threading.Lock()
+
+    def task(n):
+        result = run_request(session, base_url, n, same_topic, wait)
+        with progress_lock:
+            progress["finished"] += 1
+            if progress["finished"] % max(1, total // 10) == 0:
+                print(f"⏳ {progress['finished']}/{total} requests finished")
+        return result
+
+    print(f"🚀 {total} requests against {base_url} with {concurrency} concurrent users...")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(task, range(total)))
+    elapsed = time.perf_counter() - started
+    session.close()
+    return summarize(results, elapsed)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-tests /generate_video/ and reports latency percentiles and throughput.")
+    parser.add_argument("--url", default=BASE_URL, help="Base URL of the app")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS, help="Jobs to submit in total")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Concurrent virtual users")
+    parser.add_argument("--same-topic", action="store_true", help="Reuse one topic, so the GPT cache answers")
+    parser.add_argument("--no-wait", action="store_true", help="Only submit jobs, without following them")
+    parser.add_argument("--fakes-url", help="Fake provider server whose response counts are reported")
+    parser.add_argument("--output", help="Write the summary to this JSON file")
+    args = parser.parse_args()
+
+    summary = load_test(args.url.rstrip("/"), args.requests, args.concurrency, args.same_topic, not args.no_wait)
+    if args.fakes_url:
+        try:
+            summary["provider_responses"] = requests.get(f"{args.fakes_url.rstrip('/')}/stats", timeout=REQUEST_TIMEOUT).json()
+        except requests.RequestException as e:
+            print(f"⚠️ Could not read the fake provider stats: {e}")
+    print_summary(summary, not args.no_wait)
+    if "provider_responses" in summary:
+        print(f"   provider responses: {summary['provider_responses']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=4)
+        print(f"💾 Saved the summary to {args.output}")
+
+    if summary["submit_status"].get("202", 0) < args.requests:
+        sys.exit(1)
@@ -1,18 +1,25 @@
-from fastapi import FastAPI, Form, Request
-from fastapi.responses import HTMLResponse
-import requests
+from fastapi import FastAPI, Form, Request, HTTPException
+from fastapi.responses import HTMLResponse, JSONResponse
 import os
+import asyncio
 from dotenv import load_dotenv
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
+from job_queue import JobQueue, WorkerPool
+from provider_clients import get_client, close_clients
+from GptScriptMaking import cached_completion
 
 # Load API keys from .env file
 load_dotenv("credentials.env")
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-D_ID_API_KEY = os.getenv("D_ID_API_KEY")  # Free AI avatar generator
-GOOGLE_TTS_API_KEY = os.getenv("GOOGLE_TTS_API_KEY")  # Free text-to-speech
-PICTORY_AI_KEY = os.getenv("PICTORY_AI_KEY")  # Free animated slide generator
+# Provider API keys (OpenAI, D-ID, Google TTS, Pictory) are read by provider_clients
+
+# Background processing: jobs are kept in a local SQLite queue and run by a worker pool
+VIDEO_WORKERS = int(os.getenv("VIDEO_WORKERS", "2"))
+STAGES = ["script", "speech", "avatar", "animation", "edit"]
+# Final edit: "openshot" (the OpenShot API) or "none", which returns the provider videos unedited,
+# e.g. for load tests against fake_providers.py
+EDITOR_BACKEND = os.getenv("EDITOR_BACKEND", "openshot")
 
 app = FastAPI()
 
@@ -20,82 +27,84 @@ app = FastAPI()
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
-@app.get("/", response_class=HTMLResponse)
-def render_form(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request, "video_url": None})
+def send_chat_completion(payload):
+    openai_response = get_client("openai").post("/v1/chat/completions", json=payload)
+    return openai_response["choices"][0]["message"]["content"]
 
-@app.post("/generate_video/")
-def generate_video(
-    request: Request,
-    topic: str = Form(...),
-    voice: str = Form(...),
-    emotion: str = Form(...),
-    speed: float = Form(...),
-    length: int = Form(...),
-    avatar_gender: str = Form(...),
-    avatar_skin_color: str = Form(...),
-    avatar_hair: str = Form(...),
-    avatar_eyes: str = Form(...)
-):
-    """Generates a presentation-style video using free AI APIs"""
+async def generate_video_async(params, report):
+    """Runs the provider chain OpenAI -> TTS -> (D-ID | Pictory) -> edit; D-ID and Pictory run concurrently."""
+    topic = params["topic"]
 
     # 1️⃣ OpenAI: Generate structured script
-    openai_response = requests.post(
-        "https://api.openai.com/v1/chat/completions",
-        headers={"Authorization": f"Bearer {OPENAI_API_KEY}"},
-        json={
-            "model": "gpt-4o",
-            "messages": [
-                {"role": "system", "content": "Generate a structured, engaging script for a video presentation with key points and summaries."},
-                {"role": "user", "content": f"Create a presentation video script about {topic}."}
-            ]
-        }
+    report("script", "running")
+    payload = {
+        "model": "gpt-4o",
+        "messages": [
+            {"role": "system", "content": "Generate a structured, engaging script for a video presentation with key points and summaries."},
+            {"role": "user", "content": f"Create a presentation video script about {topic}."}
+        ]
+    }
+    script = await asyncio.to_thread(
+        cached_completion, payload, send_chat_completion, force=params.get("force_regenerate", False)
     )
-    script = openai_response.json()["choices"][0]["message"]["content"]
+    report("script", "done")
 
     # 2️⃣ Google Cloud Text-to-Speech (Free Alternative to ElevenLabs)
-    google_tts_response = requests.post(
-        "https://texttospeech.googleapis.com/v1/text:synthesize",
-        headers={"Authorization": f"Bearer {GOOGLE_TTS_API_KEY}"},
+    report("speech", "running")
+    google_tts_response = await get_client("google_tts").apost(
+        "/v1/text:synthesize",
         json={
             "input": {"text": script},
-            "voice": {"languageCode": "en-US", "name": voice, "ssmlGender": "NEUTRAL"},
-            "audioConfig": {"audioEncoding": "MP3", "speakingRate": speed}
+            "voice": {"languageCode": "en-US", "name": params["voice"], "ssmlGender": "NEUTRAL"},
+            "audioConfig": {"audioEncoding": "MP3", "speakingRate": params["speed"]}
         }
     )
-    audio_url = google_tts_response.json().get("audioContent")
+    audio_url = google_tts_response.get("audioContent")
+    report("speech", "done")
 
     # 3️⃣ D-ID API for AI Avatar (Free Alternative to Synthesia)
-    d_id_response = requests.post(
-        "https://api.d-id.com/talks",
-        headers={"Authorization": f"Bearer {D_ID_API_KEY}"},
-        json={
-            "script": script,
-            "voice_url": audio_url,
-            "avatar": {
-                "gender": avatar_gender,
-                "skin_color": avatar_skin_color,
-                "hair": avatar_hair,
-                "eyes": avatar_eyes
+    async def create_avatar():
+        report("avatar", "running")
+        d_id_response = await get_client("d_id").apost(
+            "/talks",
+            json={
+                "script": script,
+                "voice_url": audio_url,
+                "avatar": {
+                    "gender": params["avatar_gender"],
+                    "skin_color": params["avatar_skin_color"],
+                    "hair": params["avatar_hair"],
+                    "eyes": params["avatar_eyes"]
+                }
             }
-        }
-    )
-    avatar_video_url = d_id_response.json().get("result_url")
+        )
+        report("avatar", "done")
+        return d_id_response.get("result_url")
 
     # 4️⃣ Pictory AI for Animated Slides (Free Alternative to Runway ML)
-    pictory_response = requests.post(
-        "https://api.pictory.ai/v1/generate-video",
-        headers={"Authorization": f"Bearer {PICTORY_AI_KEY}"},
-        json={
-            "topic": topic,
-            "script": script,
-            "style": "presentation",
-            "duration": length
-        }
-    )
-    animation_video_url = pictory_response.json().get("video_url")
+    async def create_animation():
+        report("animation", "running")
+        pictory_response = await get_client("pictory").apost(
+            "/v1/generate-video",
+            json={
+                "topic": topic,
+                "script": script,
+                "style": "presentation",
+                "duration": params["length"]
+            }
+        )
+        report("animation", "done")
+        return pictory_response.get("video_url")
+
+    # Avatar and animation only depend on the script and audio, so they run side by side
+    avatar_video_url, animation_video_url = await asyncio.gather(create_avatar(), create_animation())
 
     # 5️⃣ OpenShot for Final Video Editing (Free Alternative to DaVinci Resolve)
+    report("edit", "running")
+    if EDITOR_BACKEND == "none":
+        report("edit", "done")
+        return {"video_url": avatar_video_url, "animation_url": animation_video_url}
+
     import openshot_api  # You need to install and set up OpenShot API
 
     final_video_path = f"/home/user/videos/{topic}_presentation.mp4"
@@ -103,5 +112,62 @@ def generate_video(
     openshot_api.add_clip(final_video_path, avatar_video_url)
     openshot_api.add_clip(final_video_path, animation_video_url)
     openshot_api.export_video(final_video_path)
+    report("edit", "done")
+
+    return {"video_url": final_video_path}
+
+def run_generate_video(params, report):
+    """Generates a presentation-style video using free AI APIs. Runs in a background worker."""
+    return asyncio.run(generate_video_async(params, report))
+
+job_queue = JobQueue(stages=STAGES)
+worker_pool = WorkerPool(job_queue, run_generate_video, workers=VIDEO_WORKERS)
+
+@app.on_event("startup")
+def start_workers():
+    worker_pool.start()
+
+@app.on_event("shutdown")
+def stop_workers():
+    worker_pool.stop(timeout=5)
+    close_clients()
+
+@app.get("/", response_class=HTMLResponse)
+def render_form(request: Request):
+    return templates.TemplateResponse("index.html", {"request": request, "video_url": None})
+
+@app.post("/generate_video/", status_code=202)
+def generate_video(
+    topic: str = Form(...),
+    voice: str = Form(...),
+    emotion: str = Form(...),
+    speed: float = Form(...),
+    length: int = Form(...),
+    avatar_gender: str = Form(...),
+    avatar_skin_color: str = Form(...),
+    avatar_hair: str = Form(...),
+    avatar_eyes: str = Form(...),
+    force_regenerate: bool = Form(False)
+):
+    """Queues a video generation job and returns its id immediately."""
+    job_id = job_queue.submit({
+        "topic": topic,
+        "voice": voice,
+        "emotion": emotion,
+        "speed": speed,
+        "length": length,
+        "avatar_gender": avatar_gender,
+        "avatar_skin_color": avatar_skin_color,
+        "avatar_hair": avatar_hair,
+        "avatar_eyes": avatar_eyes,
+        "force_regenerate": force_regenerate
+    })
+    return JSONResponse({"job_id": job_id, "status_url": f"/jobs/{job_id}"}, status_code=202)
 
-    return templates.TemplateResponse("index.html", {"request": request, "video_url": final_video_path})
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Reports a job's status, per-stage progress and, once done, the video URL."""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -0,0 +1,282 @@
+import os
+import json
+import base64
+import shutil
+import hashlib
+import pathlib
+import threading
+import requests
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+# Backend selection: "gcs" (default) or "local" for offline runs and tests
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "gcs")
+GCS_BUCKET_NAME = os.getenv("GCS_BUCKET_NAME", "mein-uni-bucket-2025")
+GCS_CREDENTIALS = r"C:\Users\eprot\OneDrive - Hochschule Düsseldorf\Dokumente\Uni\6. Semester (NO)\CV and DL\buoyant-airport-451611-d4-0e7f2929f9e6.json"
+
+# Local stand-in: files are copied here; serve the folder (e.g. `python -m http.server`) and
+# set LOCAL_STORAGE_URL to hand out HTTP URLs instead of file:// URLs
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", "./data/local_bucket")
+LOCAL_STORAGE_URL = os.getenv("LOCAL_STORAGE_URL")
+
+# Upload strategy by file size
+RESUMABLE_THRESHOLD = 8 * 1024 * 1024  # Resumable, chunked upload from 8 MB
+PARALLEL_THRESHOLD = 64 * 1024 * 1024  # Parallel chunk upload from 64 MB
+CHUNK_SIZE = 8 * 1024 * 1024  # Must be a multiple of 256 KB for GCS resumable uploads
+UPLOAD_WORKERS = 4
+REQUEST_TIMEOUT = 120  # Seconds per resumable-upload request, so a stalled session fails instead of hanging
+SESSIONS_FILE = "./data/.upload_sessions.json"  # Open resumable sessions, so a rerun can continue them
+
+def file_md5(path):
+    """Returns the base64 MD5 of a file, in the format GCS reports it."""
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            md5.update(block)
+    return base64.b64encode(md5.digest()).decode()
+
+def bytes_md5(data):
+    return base64.b64encode(hashlib.md5(data).digest()).decode()
+
+def file_crc32c(path):
+    """Returns the base64 CRC32C of a file; composite objects only carry this checksum."""
+    import google_crc32c
+
+    checksum = google_crc32c.Checksum()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            checksum.update(block)
+    return base64.b64encode(checksum.digest()).decode()
+
+class StorageBackend(ABC):
+    """Common interface of the object storage backends."""
+
+    @abstractmethod
+    def upload_file(self, path, name, content_type=None, public=False):
+        """Uploads a local file as object `name` unless identical content is already stored. Returns its URL."""
+
+    @abstractmethod
+    def upload_bytes(self, data, name, content_type=None, public=False):
+        """Uploads an in-memory buffer as object `name` unless identical content is already stored. Returns its URL."""
+
+    @abstractmethod
+    def public_url(self, name):
+        """Returns the URL of object `name`."""
+
+    def upload_many(self, items, max_workers=UPLOAD_WORKERS):
+        """Uploads (path, name) pairs in parallel. Returns the URLs in the same order."""
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(lambda item: self.upload_file(*item), items))
+
+class GCSBackend(StorageBackend):
+    """Google Cloud Storage bucket."""
+
+    def __init__(self, bucket_name=GCS_BUCKET_NAME):
+        self.bucket_name = bucket_name
+        self._bucket = None
+        self._lock = threading.Lock()
+
+    @property
+    def bucket(self):
+        # Connect on first use, so importing modules that use storage needs no credentials
+        with self._lock:
+            if self._bucket is None:
+                from google.cloud import storage
+
+                os.environ.setdefault("GOOGLE_APPLICATION_CREDENTIALS", GCS_CREDENTIALS)
+                self._bucket = storage.Client().bucket(self.bucket_name)
+        return self._bucket
+
+    def public_url(self, name):
+        return f"https://storage.googleapis.com/{self.bucket_name}/{name}"
+
+    def _is_current(self, name, md5, path=None):
+        """True if the stored object already has this content."""
+        blob = self.bucket.get_blob(name)
+        if blob is None:
+            return False
+        if blob.md5_hash:
+            return blob.md5_hash == md5
+        # Composite objects (parallel uploads) have no MD5, only a CRC32C
+        return path is not None and blob.crc32c == file_crc32c(path)
+
+    def _finish(self, blob, name, public):
+        if public:
+            blob.make_public()  # Make it publicly accessible for HeyGen
+            print(f"📎 Public URL: {self.public_url(name)}")
+        return self.public_url(name)
+
+    def upload_bytes(self, data, name, content_type=None, public=False):
+        blob = self.bucket.blob(name)
+        if self._is_current(name, bytes_md5(data)):
+            print(f"⏭️ gs://{self.bucket_name}/{name} is up to date, skipping upload")
+        else:
+            blob.upload_from_string(data, content_type=content_type)
+            print(f"✅ Uploaded {len(data)} bytes to gs://{self.bucket_name}/{name}")
+        return self._finish(blob, name, public)
+
+    def upload_file(self, path, name, content_type=None, public=False):
+        md5 = file_md5(path)
+        blob = self.bucket.blob(name)
+        if self._is_current(name, md5, path):
+            print(f"⏭️ gs://{self.bucket_name}/{name} is up to date, skipping upload")
+            return self._finish(blob, name, public)
+
+        size = os.path.getsize(path)
+        if size >= PARALLEL_THRESHOLD:
+            from google.cloud.storage import transfer_manager
+
+            print(f"📤 Uploading {path} in parallel {CHUNK_SIZE // 1024 // 1024} MB chunks...")
+            transfer_manager.upload_chunks_concurrently(
+                path, blob, content_type=content_type, chunk_size=CHUNK_SIZE, max_workers=UPLOAD_WORKERS
+            )
+        elif size >= RESUMABLE_THRESHOLD:
+            self._resumable_upload(path, blob, md5, size, content_type)
+        else:
+            print(f"📤 Uploading {path}...")
+            blob.upload_from_filename(path, content_type=content_type)
+
+        print(f"✅ Uploaded {path} to gs://{self.bucket_name}/{name}")
+        return self._finish(blob, name, public)
+
+    def _resumable_upload(self, path, blob, md5, size, content_type):
+        """Uploads in chunks through a resumable session; an interrupted upload continues where it stopped."""
+        key = f"{self.bucket_name}/{blob.name}:{md5}"
+        sessions = load_sessions()
+        session_url = sessions.get(key)
+        offset = query_upload_offset(session_url, size) if session_url else None
+
+        if offset is None:
+            session_url = blob.create_resumable_upload_session(content_type=content_type, size=size)
+            save_session(key, session_url)
+            offset = 0
+        elif offset:
+            print(f"⏯️ Resuming upload of {path} at {offset / size:.0%}")
+
+        with open(path, "rb") as f:
+            f.seek(offset)
+            while offset < size:
+                chunk = f.read(CHUNK_SIZE)
+                end = offset + len(chunk) - 1
+                response = requests.put(session_url, data=chunk, timeout=REQUEST_TIMEOUT,
+                                        headers={"Content-Range": f"bytes {offset}-{end}/{size}"})
+                if response.status_code in (200, 201):
+                    break
+                if response.status_code != 308:
+                    raise RuntimeError(f"Resumable upload failed: {response.status_code}, {response.text}")
+                offset = parse_range_end(response) + 1
+                f.seek(offset)
+                print(f"[+] Uploaded {offset / size:.0%} of {path}")
+
+        save_session(key, None)
+
+class LocalBackend(StorageBackend):
+    """Local directory that stands in for the bucket, for offline runs and tests."""
+
+    def __init__(self, root=LOCAL_STORAGE_DIR, base_url=LOCAL_STORAGE_URL):
+        self.root = root
+        self.base_url = base_url.rstrip("/") if base_url else None
+        os.makedirs(root, exist_ok=True)
+
+    def public_url(self, name):
+        if self.base_url:
+            return f"{self.base_url}/{name}"
+        return pathlib.Path(os.path.abspath(os.path.join(self.root, name))).as_uri()
+
+    def _is_current(self, target, md5):
+        return os.path.exists(target) and file_md5(target) == md5
+
+    def upload_bytes(self, data, name, content_type=None, public=False):
+        target = os.path.join(self.root, name)
+        if self._is_current(target, bytes_md5(data)):
+            print(f"⏭️ {target} is up to date, skipping upload")
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(f"{target}.part", "wb") as f:
+                f.write(data)
+            os.replace(f"{target}.part", target)
+            print(f"✅ Stored {len(data)} bytes as {target}")
+        return self.public_url(name)
+
+    def upload_file(self, path, name, content_type=None, public=False):
+        target = os.path.join(self.root, name)
+        md5 = file_md5(path)
+        if self._is_current(target, md5):
+            print(f"⏭️ {target} is up to date, skipping upload")
+            return self.public_url(name)
+
+        # Copy in chunks into a .part file. Its source (MD5 and size) is recorded next to it, and
+        # a rerun after an interruption only continues it if the source is still the same file
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        part, part_info = f"{target}.part", f"{target}.part.json"
+        source = {"md5": md5, "size": os.path.getsize(path)}
+        offset = 0
+        if os.path.exists(part) and os.path.exists(part_info):
+            with open(part_info, "r", encoding="utf-8") as f:
+                if json.load(f) == source and os.path.getsize(part) <= source["size"]:
+                    offset = os.path.getsize(part)
+        if offset:
+            print(f"⏯️ Resuming copy of {path} at byte {offset}")
+        else:
+            with open(part_info, "w", encoding="utf-8") as f:
+                json.dump(source, f)
+
+        with open(path, "rb") as src, open(part, "ab" if offset else "wb") as dst:
+            src.seek(offset)
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        os.replace(part, target)
+        os.remove(part_info)
+
+        if file_md5(target) != md5:
+            os.remove(target)
+            raise RuntimeError(f"Stored copy of {path} does not match the source (MD5 mismatch)")
+        print(f"✅ Stored {path} as {target}")
+        return self.public_url(name)
+
+def load_sessions():
+    if not os.path.exists(SESSIONS_FILE):
+        return {}
+    with open(SESSIONS_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+_sessions_lock = threading.Lock()
+
+def save_session(key, session_url):
+    """Records (or with None, removes) an open resumable upload session."""
+    with _sessions_lock:
+        sessions = load_sessions()
+        if session_url:
+            sessions[key] = session_url
+        else:
+            sessions.pop(key, None)
+        os.makedirs(os.path.dirname(SESSIONS_FILE), exist_ok=True)
+        with open(SESSIONS_FILE, "w", encoding="utf-8") as f:
+            json.dump(sessions, f, indent=4)
+
+def parse_range_end(response):
+    """Returns the last byte the server has stored, from a 308 response's Range header (-1 if none)."""
+    range_header = response.headers.get("Range")
+    return int(range_header.split("-")[1]) if range_header else -1
+
+def query_upload_offset(session_url, size):
+    """Asks GCS how much of a resumable upload it has. Returns the next offset, or None if the session is gone."""
+    try:
+        response = requests.put(session_url, headers={"Content-Range": f"bytes */{size}"}, timeout=REQUEST_TIMEOUT)
+    except requests.RequestException:
+        return None
+    if response.status_code == 308:
+        return parse_range_end(response) + 1
+    if response.status_code in (200, 201):
+        return size
+    return None
+
+_storage = None
+_storage_lock = threading.Lock()
+
+def get_storage():
+    """Returns the shared storage backend selected by STORAGE_BACKEND."""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            _storage = LocalBackend() if STORAGE_BACKEND == "local" else GCSBackend()
+    return _storage
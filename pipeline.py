@@ -0,0 +1,261 @@
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# Incremental build of the whole video. Every stage is one of the pipeline scripts, run as a
+# subprocess; it is only re-run when its inputs, parameters or script changed since its last
+# successful run, or an output is missing. Independent branches run in parallel.
+
+BUILD_MANIFEST = "./data/.build_manifest.json"
+DECK_MANIFEST = "./data/decks.json"
+DEFAULT_JOBS = 2  # Stages running at the same time
+
+def deck_inputs():
+    """The slide sources: the deck manifest and its PDFs, or the split single-page PDFs without one."""
+    if not os.path.exists(DECK_MANIFEST):
+        return sorted(glob.glob("./data/slides/*.pdf"))
+    with open(DECK_MANIFEST, "r", encoding="utf-8") as f:
+        decks = json.load(f)["decks"]
+    base_dir = os.path.dirname(DECK_MANIFEST)
+    files = dict.fromkeys(os.path.join(base_dir, deck["file"]) for deck in decks)  # A deck may appear more than once
+    return [DECK_MANIFEST] + list(files)
+
+class Stage:
+    """One step of the build: a script with its declared input and output files.
+
+    inputs may be a callable, for stages whose sources are only known at run time.
+    after lists stages that must finish first without sharing a file with this one
+    (e.g. an upload whose result lives in the cloud).
+    """
+
+    def __init__(self, name, script, args=(), inputs=(), outputs=(), params=None, after=()):
+        self.name = name
+        self.script = script
+        self.args = list(args)
+        self._inputs = inputs
+        self.outputs = list(outputs)
+        self.params = params or {}
+        self.after = list(after)
+
+    @property
+    def inputs(self):
+        inputs = self._inputs() if callable(self._inputs) else list(self._inputs)
+        return inputs + [self.script]  # A changed script rebuilds its stage
+
+    @property
+    def command(self):
+        return [sys.executable, self.script] + self.args
+
+STAGES = [
+    Stage("slides", "slide2vid.py", args=["--profile", "still"],
+          inputs=deck_inputs, outputs=["./data/final_slides_video.mp4"], params={"profile": "still"}),
+    Stage("script", "GptScriptMaking.py", args=["./data/instructions.txt"],
+          inputs=["./data/instructions.txt"], outputs=["./data/output_gpt.txt"]),
+    Stage("speech", "TextToSpeech_Google.py", args=["./data/output_gpt.txt", "MP3"],
+          inputs=["./data/output_gpt.txt"], outputs=["./data/output.mp3"], params={"format": "MP3"}),
+    Stage("upload", "upload2google.py", args=["./data/output.mp3"],
+          inputs=["./data/output.mp3"], outputs=["./data/uploaded_parts.json"]),
+    Stage("avatar", "Heygen_Avatar.py", args=["--pipelined", "--crop", "square"],
+          inputs=["./data/uploaded_parts.json"], outputs=["./data/final_cropped_avatar.mp4"],
+          params={"crop": "square"}),
+    Stage("assemble", "assemble_video.py",
+          inputs=["./data/final_slides_video.mp4", "./data/final_cropped_avatar.mp4"],
+          outputs=["./data/final_combined_video.mp4"]),
+]
+
+class BuildManifest:
+    """Per-stage record of the input hashes, parameters and outputs of the last successful run.
+
+    File hashes are reused while a file's size and mtime are unchanged, so large
+    videos are only read again after they changed.
+    """
+
+    def __init__(self, path=BUILD_MANIFEST):
+        self.path = path
+        self._lock = threading.Lock()
+        self.data = {"stages": {}, "files": {}}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+
+    def file_hash(self, path):
+        """Returns the SHA-256 of a file, or None if it does not exist."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        key = os.path.normpath(path)
+        with self._lock:
+            known = self.data["files"].get(key)
+        if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            return known["sha256"]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        with self._lock:
+            self.data["files"][key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+        return digest.hexdigest()
+
+    def fingerprint(self, stage):
+        """Everything that determines a stage's result."""
+        return {
+            "inputs": {os.path.normpath(path): self.file_hash(path) for path in stage.inputs},
+            "params": stage.params,
+            "command": stage.command[1:],  # Without the interpreter path, which differs between machines
+        }
+
+    def is_current(self, stage, fingerprint):
+        """True if the stage ran successfully with this fingerprint and its outputs still exist."""
+        with self._lock:
+            record = self.data["stages"].get(stage.name)
+        if record is None or record["fingerprint"] != fingerprint:
+            return False
+        return all(os.path.exists(path) for path in stage.outputs)
+
+    def record(self, stage, fingerprint):
+        outputs = {os.path.normpath(path): self.file_hash(path) for path in stage.outputs}
+        with self._lock:
+            self.data["stages"][stage.name] = {"fingerprint": fingerprint, "outputs": outputs, "built_at": time.time()}
+            self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=4)
+        os.replace(temp_path, self.path)
+
+def dependencies(stages):
+    """Maps every stage name to the names of the stages it depends on (producers of its inputs, plus after)."""
+    producers = {os.path.normpath(path): stage.name for stage in stages for path in stage.outputs}
+    deps = {}
+    for stage in stages:
+        names = {producers[os.path.normpath(path)] for path in stage.inputs if os.path.normpath(path) in producers}
+        names.update(stage.after)
+        names.discard(stage.name)
+        deps[stage.name] = names
+    return deps
+
+def select_stages(stages, targets):
+    """Returns the target stages and everything they depend on, in declaration order."""
+    if not targets:
+        return stages
+    deps = dependencies(stages)
+    unknown = set(targets) - set(deps)
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    needed, todo = set(), list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in needed:
+            needed.add(name)
+            todo.extend(deps[name])
+    return [stage for stage in stages if stage.name in needed]
+
+def run_stage(stage):
+    """Runs a stage's script, prefixing its output with the stage name. Returns True on success.
+
+    Outputs of an earlier run are moved aside first, so a failed run cannot pass them off
+    as its own; they are put back if the stage fails.
+    """
+    print(f"▶️ [{stage.name}] {' '.join(stage.command[1:])}")
+    previous = {}
+    for path in stage.outputs:
+        if os.path.exists(path):
+            previous[path] = f"{path}.prev"
+            os.replace(path, previous[path])
+
+    started = time.perf_counter()
+    # Unbuffered so output shows up live; UTF-8 so the scripts' emoji survive the pipe on Windows
+    env = {**os.environ, "PYTHONUNBUFFERED": "1", "PYTHONIOENCODING": "utf-8"}
+    process = subprocess.Popen(stage.command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               text=True, encoding="utf-8", errors="replace", env=env)
+    for line in process.stdout:
+        print(f"   [{stage.name}] {line.rstrip()}")
+    process.wait()
+
+    missing = [path for path in stage.outputs if not os.path.exists(path)]
+    if process.returncode != 0 or missing:
+        reason = f"exit code {process.returncode}" if process.returncode != 0 else f"missing outputs {missing}"
+        print(f"❌ [{stage.name}] failed ({reason})")
+        for path, backup in previous.items():
+            os.replace(backup, path)
+        return False
+
+    for backup in previous.values():
+        os.remove(backup)
+    print(f"✅ [{stage.name}] done in {time.perf_counter() - started:.1f}s")
+    return True
+
+def build(stages=STAGES, targets=None, force=(), dry_run=False, jobs=DEFAULT_JOBS, manifest_path=BUILD_MANIFEST):
+    """Brings the requested stages up to date. Returns True if every stage succeeded or was current."""
+    stages = select_stages(stages, targets)
+    deps = dependencies(stages)
+    manifest = BuildManifest(manifest_path)
+
+    pending = {stage.name: stage for stage in stages}
+    state = {}  # name -> "current", "built", "would build", "failed" or "skipped"
+
+    def check_and_run(stage):
+        # Fingerprints are taken once the dependencies are done, so they see the new inputs
+        # A rebuilt dependency whose outputs came out byte-identical does not make this stage stale;
+        # in a dry run its new outputs are unknown, so it does
+        fingerprint = manifest.fingerprint(stage)
+        would_change = any(state[name] == "would build" for name in deps[stage.name])
+        if stage.name not in force and not would_change and manifest.is_current(stage, fingerprint):
+            print(f"⏭️ [{stage.name}] up to date")
+            return "current"
+        if dry_run:
+            print(f"📝 [{stage.name}] would run")
+            return "would build"
+        if not run_stage(stage):
+            return "failed"
+        manifest.record(stage, manifest.fingerprint(stage))
+        return "built"
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        running = {}
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if any(state.get(dep) in ("failed", "skipped") for dep in deps[name]):
+                    print(f"⛔ [{name}] skipped, a dependency failed")
+                    state[name] = "skipped"
+                    del pending[name]
+                elif all(dep in state for dep in deps[name]):
+                    running[pool.submit(check_and_run, stage)] = name
+                    del pending[name]
+
+            if not running:
+                if pending:
+                    raise ValueError(f"Dependency cycle between stages: {', '.join(pending)}")
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                state[running.pop(future)] = future.result()
+
+    counts = {status: list(state.values()).count(status) for status in set(state.values())}
+    print(f"📊 Build finished: {', '.join(f'{n} {status}' for status, n in sorted(counts.items()))}")
+    return not any(status in ("failed", "skipped") for status in state.values())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Builds the video, re-running only the stages whose inputs changed.")
+    parser.add_argument("targets", nargs="*", help=f"Stages to build with their dependencies (default: all). "
+                                                   f"Stages: {', '.join(stage.name for stage in STAGES)}")
+    parser.add_argument("--force", nargs="+", default=[], metavar="STAGE", help="Re-run these stages regardless")
+    parser.add_argument("--dry-run", action="store_true", help="Only show which stages would run")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help="Stages running in parallel")
+    args = parser.parse_args()
+
+    if not build(targets=args.targets, force=set(args.force), dry_run=args.dry_run, jobs=args.jobs):
+        sys.exit(1)
@@ -0,0 +1,84 @@
+import os
+import asyncio
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+# Load API keys from .env file
+load_dotenv("credentials.env")
+
+# Base URLs can be overridden, e.g. to point the pipeline at local fake providers
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com")
+GOOGLE_TTS_BASE_URL = os.getenv("GOOGLE_TTS_BASE_URL", "https://texttospeech.googleapis.com")
+D_ID_BASE_URL = os.getenv("D_ID_BASE_URL", "https://api.d-id.com")
+PICTORY_BASE_URL = os.getenv("PICTORY_BASE_URL", "https://api.pictory.ai")
+
+POOL_SIZE = int(os.getenv("PROVIDER_POOL_SIZE", "8"))  # Keep-alive connections per provider host
+REQUEST_TIMEOUT = 120
+
+class ProviderClient:
+    """HTTP client for one provider host with a shared keep-alive connection pool.
+
+    The session is thread-safe for this use (one adapter, no per-request state), so all
+    workers share it. The async methods run the blocking call in a worker thread.
+    """
+
+    def __init__(self, base_url, api_key=None, pool_size=POOL_SIZE, timeout=REQUEST_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if api_key:
+            self.session.headers.update({"Authorization": f"Bearer {api_key}"})
+
+    def request(self, method, path, **kwargs):
+        """Sends a request and returns the decoded JSON body. Raises RuntimeError on an HTTP error."""
+        kwargs.setdefault("timeout", self.timeout)
+        response = self.session.request(method, f"{self.base_url}{path}", **kwargs)
+        if not response.ok:
+            raise RuntimeError(f"{method} {self.base_url}{path} failed: {response.status_code}, {response.text[:500]}")
+        return response.json()
+
+    def post(self, path, json=None, **kwargs):
+        return self.request("POST", path, json=json, **kwargs)
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    async def apost(self, path, json=None, **kwargs):
+        return await asyncio.to_thread(self.post, path, json, **kwargs)
+
+    async def aget(self, path, **kwargs):
+        return await asyncio.to_thread(self.get, path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(name):
+    """Returns the shared client for a provider: "openai", "google_tts", "d_id" or "pictory"."""
+    with _clients_lock:
+        if name not in _clients:
+            if name == "openai":
+                _clients[name] = ProviderClient(OPENAI_BASE_URL, os.getenv("OPENAI_API_KEY"))
+            elif name == "google_tts":
+                _clients[name] = ProviderClient(GOOGLE_TTS_BASE_URL, os.getenv("GOOGLE_TTS_API_KEY"))
+            elif name == "d_id":
+                _clients[name] = ProviderClient(D_ID_BASE_URL, os.getenv("D_ID_API_KEY"))
+            elif name == "pictory":
+                _clients[name] = ProviderClient(PICTORY_BASE_URL, os.getenv("PICTORY_AI_KEY"))
+            else:
+                raise ValueError(f"Unknown provider: {name}")
+        return _clients[name]
+
+def close_clients():
+    """Closes all pooled connections, e.g. on server shutdown."""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
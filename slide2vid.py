@@ -1,16 +1,52 @@
 import os
 import re
-import subprocess
-from pdf2image import convert_from_path
+import sys
+import json
+import time
+import argparse
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import deck_manifest
+from concat_video import concat_copy
+from ffmpeg_runner import run_ffmpeg, x264_args, report_timings
 
 # Paths
 SLIDES_DIR = "./data/slides"
 IMAGES_DIR = "./data/slides_images"
 OUTPUT_VIDEO = "./data/final_slides_video.mp4"
-SLIDES_LIST_FILE = os.path.join(IMAGES_DIR, "slides_list.txt")
+SEGMENTS_DIR = "./data/slide_segments"  # One encoded segment per slide, named by segment_key
 
 # Video properties
 FPS = 30  # Frames per second
+VIDEO_WIDTH = 1920  # Slides are rendered straight at the frame size of the video
+VIDEO_HEIGHT = 1080
+BACKGROUND = (0, 0, 0)  # Padding colour when a slide's aspect ratio differs from the video's
+RASTER_WORKERS = os.cpu_count() or 1
+
+# Slide segments: identical settings for all of them, so they can be joined by stream copy
+SEGMENT_FILTER = (f"scale={VIDEO_WIDTH}:{VIDEO_HEIGHT}:force_original_aspect_ratio=decrease,"
+                  f"pad={VIDEO_WIDTH}:{VIDEO_HEIGHT}:(ow-iw)/2:(oh-ih)/2,setsar=1,format=yuv420p")
+# Encoding profiles for the slide segments. "still" encodes at a low base frame rate with
+# x264's still-image tuning: a 367s deck is ~370 frames instead of ~11,000. Every segment
+# starts with a keyframe, so keyframes sit exactly on slide changes. Compositors
+# (assemble_video.py) upsample to the avatar's frame rate themselves.
+ENCODING_PROFILES = {
+    "standard": {
+        "fps": FPS,
+        "args": [*x264_args(), "-pix_fmt", "yuv420p",
+                 "-flags", "+cgop",  # Closed GOPs: every segment decodes on its own
+                 "-video_track_timescale", "15360"],
+    },
+    "still": {
+        "fps": 1,  # Durations are rounded to whole frames, i.e. to seconds
+        "args": [*x264_args(), "-pix_fmt", "yuv420p", "-tune", "stillimage",
+                 "-g", "300",  # Long GOP: one keyframe per slide is enough
+                 "-flags", "+cgop",
+                 "-video_track_timescale", "15360"],
+    },
+}
+DEFAULT_PROFILE = "still"
+SEGMENT_WORKERS = max(1, (os.cpu_count() or 1) // 2)  # x264 is multithreaded itself
 
 # Correct slide durations (in seconds)
 slide_durations = [
@@ -23,8 +59,125 @@ def extract_slide_number(filename):
     match = re.search(r"slide_(\d+)", filename)
     return int(match.group(1)) if match else float('inf')
 
-def convert_slides_to_images():
-    """Convert PDF slides to images and use JPEGs directly."""
+def fit_size(page_width, page_height, width=VIDEO_WIDTH, height=VIDEO_HEIGHT):
+    """Returns the largest size with the page's aspect ratio that fits in width x height."""
+    scale = min(width / page_width, height / page_height)
+    return max(1, round(page_width * scale)), max(1, round(page_height * scale))
+
+def fit_to_canvas(image):
+    """Aspect-fit: centres a rendered page on a canvas of the video size if its aspect ratio differs."""
+    from PIL import Image
+
+    image = image.convert("RGB")
+    if image.size == (VIDEO_WIDTH, VIDEO_HEIGHT):
+        return image
+    canvas = Image.new("RGB", (VIDEO_WIDTH, VIDEO_HEIGHT), BACKGROUND)
+    canvas.paste(image, ((VIDEO_WIDTH - image.width) // 2, (VIDEO_HEIGHT - image.height) // 2))
+    return canvas
+
+def rasterize_slide(job):
+    """Renders the first page of a PDF at the video frame size and saves it as PPM. Runs in a worker process.
+
+    Returns (image_filename, seconds).
+    """
+    from pdf2image import convert_from_path, pdfinfo_from_path
+
+    slide_path, image_filename = job
+    started = time.perf_counter()
+
+    # "Page size" is reported in points, e.g. "960 x 540 pts"
+    page_size = pdfinfo_from_path(slide_path)["Page size"].split()
+    size = fit_size(float(page_size[0]), float(page_size[2]))
+    image = convert_from_path(slide_path, size=size, first_page=1, last_page=1)[0]
+
+    # Uncompressed PPM: no compression cost when writing, and FFmpeg reads it directly
+    fit_to_canvas(image).save(image_filename, "PPM")
+    return image_filename, time.perf_counter() - started
+
+def rasterize_pages(job):
+    """Renders a range of pages of one PDF (all of the same size) straight from the deck. Runs in a worker process.
+
+    Returns (first_page, last_page, seconds).
+    """
+    from pdf2image import convert_from_path
+
+    pdf_path, first_page, last_page, size, image_filenames = job
+    started = time.perf_counter()
+    images = convert_from_path(pdf_path, size=size, first_page=first_page, last_page=last_page)
+    for image, image_filename in zip(images, image_filenames):
+        fit_to_canvas(image).save(image_filename, "PPM")
+    return first_page, last_page, time.perf_counter() - started
+
+def plan_render_jobs(pages, max_workers=RASTER_WORKERS):
+    """Groups pages into first_page/last_page ranges, split so every worker gets a share.
+
+    Pages are (pdf, page_number, size, image_filename) tuples in timeline order.
+    """
+    runs = []
+    for pdf, number, size, image_filename in pages:
+        run = runs[-1] if runs else None
+        if run and run[0] == pdf and run[2] == number - 1 and run[3] == size:
+            run[2] = number
+            run[4].append(image_filename)
+        else:
+            runs.append([pdf, number, number, size, [image_filename]])
+
+    per_job = max(1, -(-len(pages) // max_workers))  # ceil
+    jobs = []
+    for pdf, first, last, size, image_filenames in runs:
+        for start in range(first, last + 1, per_job):
+            end = min(start + per_job - 1, last)
+            jobs.append((pdf, start, end, size, image_filenames[start - first:end - first + 1]))
+    return jobs
+
+def convert_deck_pages(manifest_file=deck_manifest.MANIFEST_FILE, max_workers=RASTER_WORKERS):
+    """Rasterizes the pages listed in the deck manifest straight from the source PDFs.
+
+    Images are named by a hash of the page content and the render settings, so pages
+    that did not change are never rendered again, even if decks are reordered.
+    """
+    pages = deck_manifest.load_manifest(manifest_file, salt=f"{VIDEO_WIDTH}x{VIDEO_HEIGHT}:{BACKGROUND}")
+
+    image_files = []
+    missing = []
+    queued = set()
+    for page in pages:
+        image_filename = os.path.join(IMAGES_DIR, f"{page['hash']}.ppm")
+        if not os.path.exists(image_filename) and image_filename not in queued:
+            missing.append((page["pdf"], page["page"], fit_size(*page["size"]), image_filename))
+            queued.add(image_filename)
+        image_files.append(os.path.abspath(image_filename))
+
+    print(f"📂 {len(pages)} slides in the manifest, {len(pages) - len(missing)} already rendered")
+    if missing:
+        jobs = plan_render_jobs(missing, max_workers)
+        print(f"⚡ Rasterizing {len(missing)} pages at {VIDEO_WIDTH}x{VIDEO_HEIGHT} with {min(max_workers, len(jobs))} processes...")
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(jobs))) as pool:
+            for job, (first, last, seconds) in zip(jobs, pool.map(rasterize_pages, jobs)):
+                count = last - first + 1
+                print(f"📷 Rendered {os.path.basename(job[0])} pages {first}-{last} in {seconds:.2f}s ({seconds / count:.2f}s/page)")
+        print(f"✅ Rasterized {len(missing)} pages in {time.perf_counter() - started:.2f}s")
+
+    return image_files
+
+def load_slide_durations():
+    """Returns the slide durations from the deck manifest, or slide_durations if it does not list them."""
+    if os.path.exists(deck_manifest.MANIFEST_FILE):
+        durations = deck_manifest.read_durations()
+        if durations is not None:
+            return durations
+    return slide_durations
+
+def convert_slides_to_images(max_workers=RASTER_WORKERS):
+    """Convert PDF slides to frame-sized images in parallel and use JPEGs directly.
+
+    With a deck manifest, pages are rendered straight from the source decks; otherwise
+    the single-page PDFs from split_presenation.py in SLIDES_DIR are used.
+    """
+    if os.path.exists(deck_manifest.MANIFEST_FILE):
+        return convert_deck_pages(max_workers=max_workers)
+
     slide_files = sorted(
         [f for f in os.listdir(SLIDES_DIR) if f.lower().endswith((".pdf", ".jpg", ".jpeg"))],
         key=lambda x: extract_slide_number(x)  # Sort numerically
@@ -35,30 +188,77 @@ def convert_slides_to_images():
         print(f"   - {f}")
 
     image_files = []
+    jobs = []
     for slide in slide_files:
         slide_path = os.path.join(SLIDES_DIR, slide)
-        image_filename = os.path.join(IMAGES_DIR, f"{os.path.splitext(slide)[0]}.png")
 
         if slide.lower().endswith(".pdf"):
+            image_filename = os.path.join(IMAGES_DIR, f"{os.path.splitext(slide)[0]}.ppm")
             if os.path.exists(image_filename):
                 print(f"⏭️ Skipping already converted {slide}")
             else:
-                images = convert_from_path(slide_path, dpi=300)
-                images[0].save(image_filename, "PNG")
-                print(f"📷 Converted {slide} -> {image_filename}")
+                jobs.append((slide_path, image_filename))
         else:
+            image_filename = os.path.join(IMAGES_DIR, f"{os.path.splitext(slide)[0]}.png")
             if not os.path.exists(image_filename):
                 os.rename(slide_path, image_filename)
             print(f"🖼 Using existing JPEG: {slide}")
 
         image_files.append(os.path.abspath(image_filename))  # Store absolute path
 
+    if jobs:
+        print(f"⚡ Rasterizing {len(jobs)} slides at {VIDEO_WIDTH}x{VIDEO_HEIGHT} with {min(max_workers, len(jobs))} processes...")
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(jobs))) as pool:
+            for image_filename, seconds in pool.map(rasterize_slide, jobs):
+                print(f"📷 Converted {os.path.basename(image_filename)} in {seconds:.2f}s")
+        print(f"✅ Rasterized {len(jobs)} slides in {time.perf_counter() - started:.2f}s")
+
     return image_files
 
-def create_video_from_slides(image_files):
-    """Create a video from slide images using FFmpeg."""
+def segment_key(image, duration, profile=DEFAULT_PROFILE):
+    """Hash of everything that determines a slide's segment: image content, duration, frame rate and encoder settings."""
+    digest = hashlib.sha256()
+    with open(image, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    settings = [duration, VIDEO_WIDTH, VIDEO_HEIGHT, SEGMENT_FILTER, ENCODING_PROFILES[profile]]
+    digest.update(json.dumps(settings).encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+def encode_segment(job):
+    """Encodes one slide as a self-contained closed-GOP segment. Returns True on success."""
+    image, duration, segment, profile = job
+    fps = ENCODING_PROFILES[profile]["fps"]
+    frames = max(1, round(duration * fps))
+    temp_path = f"{segment}.part.mp4"
+    ffmpeg_args = [
+        "-v", "error",
+        "-loop", "1", "-framerate", str(fps), "-i", image,
+        "-vf", SEGMENT_FILTER,
+        "-frames:v", str(frames),
+        *ENCODING_PROFILES[profile]["args"],
+        "-y", temp_path
+    ]
+
+    result = run_ffmpeg(ffmpeg_args, label=f"slide segment {os.path.basename(image)}")
+    if not result.ok:
+        print(f"❌ FFmpeg error for {os.path.basename(image)}:\n{result.stderr}")
+        return False
+
+    os.replace(temp_path, segment)
+    print(f"🎞️ Encoded {os.path.basename(image)} ({duration}s) in {result.seconds:.2f}s")
+    return True
+
+def create_video_from_slides(image_files, durations=None, profile=DEFAULT_PROFILE):
+    """Create a video from slide images using FFmpeg.
+
+    Every slide is encoded as its own segment, cached by content, so only new or
+    changed slides are encoded; the segments are then joined by stream copy.
+    """
+    durations = durations or load_slide_durations()
     num_slides = len(image_files)
-    expected_slides = len(slide_durations)
+    expected_slides = len(durations)
 
     print(f"📊 Slides Detected: {num_slides}, Expected Durations: {expected_slides}")
 
@@ -66,45 +266,42 @@ def create_video_from_slides(image_files):
         print(f"❌ ERROR: Found {num_slides} slides but expected {expected_slides}. Check missing files!")
         return False
 
-    # Create FFmpeg input file
-    with open(SLIDES_LIST_FILE, "w", encoding="utf-8") as f:
-        for img, duration in zip(image_files, slide_durations):
-            f.write(f"file '{img.replace(os.sep, '/')}'\n")
-            f.write(f"duration {duration:.2f}\n")
-
-    # Ensure last slide is displayed
-    with open(SLIDES_LIST_FILE, "a", encoding="utf-8") as f:
-        f.write(f"file '{image_files[-1].replace(os.sep, '/')}'\n")
-
-    print(f"🎬 Creating video with FFmpeg (Total Duration: {sum(slide_durations)}s)...")
-
-    # Run FFmpeg
-    ffmpeg_cmd = [
-        "ffmpeg",
-        "-f", "concat",
-        "-safe", "0",
-        "-i", SLIDES_LIST_FILE,
-        "-vf", f"fps={FPS},format=yuv420p",
-        "-c:v", "libx264",
-        "-pix_fmt", "yuv420p",
-        "-y", OUTPUT_VIDEO
-    ]
+    print(f"🎬 Creating video from {num_slides} slide segments (Total Duration: {sum(durations)}s)...")
+    os.makedirs(SEGMENTS_DIR, exist_ok=True)
 
-    result = subprocess.run(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    segments, jobs = [], []
+    for image, duration in zip(image_files, durations):
+        segment = os.path.join(SEGMENTS_DIR, f"{segment_key(image, duration, profile)}.mp4")
+        if not os.path.exists(segment) and segment not in (job[2] for job in jobs):
+            jobs.append((image, duration, segment, profile))
+        segments.append(segment)
 
-    if result.returncode == 0:
+    print(f"⏭️ {num_slides - len(jobs)} segments cached, encoding {len(jobs)} with the '{profile}' profile")
+    with ThreadPoolExecutor(max_workers=SEGMENT_WORKERS) as pool:
+        results = list(pool.map(encode_segment, jobs))
+    if not all(results):
+        return False
+
+    # The segments share all encoder settings, so they join without re-encoding
+    if concat_copy(segments, OUTPUT_VIDEO):
         print(f"✅ Successfully created video: {OUTPUT_VIDEO}")
         return True
-    else:
-        print(f"❌ FFmpeg error:\n{result.stderr.decode()}")
-        return False
+    return False
 
-def main():
-    """Main execution function."""
+def main(profile=DEFAULT_PROFILE):
+    """Main execution function. Returns True if the slides video was created."""
     os.makedirs(IMAGES_DIR, exist_ok=True)
     image_files = convert_slides_to_images()
-    if image_files:
-        create_video_from_slides(image_files)
+    if not image_files:
+        print("❌ No slide images to render.")
+        return False
+    ok = create_video_from_slides(image_files, profile=profile)
+    report_timings()
+    return ok
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Renders the slides into the slides video.")
+    parser.add_argument("--profile", choices=sorted(ENCODING_PROFILES), default=DEFAULT_PROFILE,
+                        help="Encoding profile for the slide segments")
+    if not main(parser.parse_args().profile):
+        sys.exit(1)
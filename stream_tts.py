@@ -0,0 +1,206 @@
+import re
+import sys
+import json
+import time
+import argparse
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from GptScriptMaking import (OPENAI_API_KEY, OPENAI_CHAT_URL, OUTPUT_FILE, GPT_CACHE, build_payload,
+                             read_instructions, write_if_changed)
+from TextToSpeech_Google import (MAX_TTS_CHUNK_SIZE, DEFAULT_CONCURRENCY, TTS_CACHE, create_session,
+                                 synthesize_chunk, merge_audio_files, split_text)
+
+# Streaming mode: the script is synthesized sentence by sentence while GPT is still writing it
+
+# Same sentence ends as TextToSpeech_Google.SENTENCE_END, on text instead of UTF-8 bytes
+SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*(?=\s)|\n")
+MIN_STREAM_CHUNK = 300  # Characters per TTS request after the first one, which is sent as soon as possible
+STREAM_TIMEOUT = 120  # Seconds without data before the stream is given up
+
+def stream_completion(payload):
+    """Yields the content deltas of a streamed chat completion (server-sent events)."""
+    if not OPENAI_API_KEY:
+        print("Error: OpenAI API key not found. Please set it in a .env file.")
+        sys.exit(1)
+
+    headers = {"Authorization": f"Bearer {OPENAI_API_KEY}", "Content-Type": "application/json"}
+    with requests.post(OPENAI_CHAT_URL, headers=headers, json={**payload, "stream": True},
+                       stream=True, timeout=STREAM_TIMEOUT) as response:
+        if response.status_code != 200:
+            print(f"Error: {response.status_code}, {response.text}")
+            sys.exit(1)
+
+        for line in response.iter_lines(decode_unicode=False):
+            if not line.startswith(b"data:"):
+                continue  # Blank keep-alive lines and SSE comments
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                break
+            choices = json.loads(data).get("choices") or [{}]
+            content = choices[0].get("delta", {}).get("content")
+            if content:
+                yield content
+
+class SpokenTextFilter:
+    """Incremental version of TextToSpeech_Google.filter_spoken_text.
+
+    Text is fed in arbitrary pieces; (( ... )) markers are removed even when they span
+    several pieces. Like the regex, a marker must close on the same line, otherwise
+    the "((" is kept as text.
+    """
+
+    def __init__(self):
+        self.pending = ""
+
+    def feed(self, text):
+        """Returns the spoken text that is certain so far; a possible unfinished marker is held back."""
+        self.pending += text
+        output = []
+        while True:
+            start = self.pending.find("((")
+            if start < 0:
+                keep = 1 if self.pending.endswith("(") else 0  # Could become "((" with the next piece
+                output.append(self.pending[:len(self.pending) - keep])
+                self.pending = self.pending[len(self.pending) - keep:]
+                break
+
+            output.append(self.pending[:start])
+            self.pending = self.pending[start:]
+            end = self.pending.find("))", 2)
+            newline = self.pending.find("\n", 2)
+            if end >= 0 and (newline < 0 or end < newline):
+                self.pending = self.pending[end + 2:]  # Complete marker: drop it
+            elif newline >= 0:
+                output.append(self.pending[0])  # No marker here; go on from the next character
+                self.pending = self.pending[1:]
+            else:
+                break  # Marker still open, wait for more text
+
+        return "".join(output)
+
+    def flush(self):
+        """Returns the held-back text at the end of the stream (an unclosed marker is kept, as with the regex)."""
+        text, self.pending = self.pending, ""
+        return text
+
+class SentenceChunker:
+    """Collects spoken text and releases it in chunks that end on a sentence boundary.
+
+    The first chunk is released at the first sentence end, so audio starts early; later
+    chunks wait for min_size characters to keep the number of TTS requests down.
+    """
+
+    def __init__(self, min_size=MIN_STREAM_CHUNK, max_size=MAX_TTS_CHUNK_SIZE):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.text = ""
+        self.released = 0
+
+    def feed(self, text):
+        """Adds text and returns the chunks that are ready."""
+        self.text += text
+        cut = 0
+        for match in SENTENCE_END.finditer(self.text):
+            cut = match.end()
+
+        if cut and (self.released == 0 or cut >= self.min_size):
+            return self._release(cut)
+        if len(self.text.encode("utf-8")) > self.max_size:
+            # No sentence end within the TTS limit: let split_text cut it and keep the tail open
+            pieces = split_text(self.text, self.max_size)
+            self.text = pieces[-1] + " "
+            self.released += len(pieces) - 1
+            return pieces[:-1]
+        return []
+
+    def _release(self, cut):
+        chunk, self.text = self.text[:cut].strip(), self.text[cut:]
+        if not chunk:
+            return []
+        self.released += 1
+        return split_text(chunk, self.max_size)
+
+    def flush(self):
+        return self._release(len(self.text))
+
+def stream_script_to_speech(prompt, voice="en-GB-Standard-D", speed=1.0, format="MP3",
+                            concurrency=DEFAULT_CONCURRENCY, cache=TTS_CACHE, force=False):
+    """Generates the script with GPT and synthesizes it while it is being written.
+
+    Sentences are filtered and sent to TTS as soon as they are complete. The full script
+    is written to output_gpt.txt and stored in the GPT cache, and the merged audio is
+    uploaded like in TextToSpeech_Google. Returns the public URL of the audio.
+    """
+    payload = build_payload(prompt)
+    key = GPT_CACHE.make_key(payload["model"], payload["messages"], payload.get("temperature"))
+    cached = None if force else GPT_CACHE.get(key)
+    if cached is not None:
+        print("⚡ Using cached GPT response")
+        deltas = [cached.decode("utf-8")]
+    else:
+        deltas = stream_completion(payload)
+
+    started = time.perf_counter()
+    first_audio = {}
+
+    def synthesize(i, chunk):
+        audio = synthesize_chunk(session, i, chunk, voice, speed, format, cache)
+        if i == 0 and audio is not None:
+            first_audio["seconds"] = time.perf_counter() - started
+        return audio
+
+    spoken_filter = SpokenTextFilter()
+    chunker = SentenceChunker()
+    script_parts = []
+    futures = []
+    session = create_session(concurrency)
+
+    with session, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        def submit(chunks):
+            for chunk in chunks:
+                print(f"🗣️ Chunk {len(futures)} ready ({len(chunk)} chars), synthesizing...")
+                futures.append(pool.submit(synthesize, len(futures), chunk))
+
+        for delta in deltas:
+            script_parts.append(delta)
+            submit(chunker.feed(spoken_filter.feed(delta)))
+        submit(chunker.feed(spoken_filter.flush()))
+        submit(chunker.flush())
+        script_done = time.perf_counter() - started
+
+        audio_chunks = [future.result() for future in futures]
+
+    script = "".join(script_parts)
+    if cached is None:
+        GPT_CACHE.put(key, script.encode("utf-8"))
+    if write_if_changed(OUTPUT_FILE, script):
+        print("[+] Response saved to output_gpt.txt")
+
+    if cache:
+        cache.report("TTS cache")
+    if "seconds" in first_audio:
+        print(f"⏱️ First audio after {first_audio['seconds']:.2f}s, script finished after {script_done:.2f}s, "
+              f"speech finished after {time.perf_counter() - started:.2f}s")
+
+    failed = [i for i, audio in enumerate(audio_chunks) if audio is None]
+    if failed:
+        print(f"❌ Chunks {failed} could not be synthesized. Aborting merge.")
+        return None
+
+    return merge_audio_files(audio_chunks, format)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates a script with ChatGPT and synthesizes it while it streams in.")
+    parser.add_argument("instruction_file", help="Text file with the instructions")
+    parser.add_argument("format", nargs="?", default="MP3", choices=["MP3", "OGG_OPUS"])
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Maximum number of chunks synthesized in parallel")
+    parser.add_argument("--no-cache", action="store_true", help="Always call the TTS API, bypassing the chunk cache")
+    parser.add_argument("--force", action="store_true", help="Ignore the GPT response cache and regenerate")
+    args = parser.parse_args()
+
+    instructions = read_instructions(args.instruction_file)
+    public_url = stream_script_to_speech(instructions, format=args.format, concurrency=args.concurrency,
+                                         cache=None if args.no_cache else TTS_CACHE, force=args.force)
+    if public_url:
+        print(f"🎉 Speech ready: {public_url}")
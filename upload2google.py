@@ -1,53 +1,83 @@
 import os
-import math
+import sys
+import json
 import subprocess
-from pydub import AudioSegment
-from google.cloud import storage
+from concurrent.futures import ThreadPoolExecutor
+from ffmpeg_runner import FFmpegProcess
+from object_storage import get_storage
 
 # File paths
 MP3_FILE = r"C:\Users\eprot\OneDrive - Hochschule Düsseldorf\Dokumente\Uni\6. Semester (NO)\CV and DL\automated-video-generation\data\output.mp3"
-GCS_BUCKET_NAME = "mein-uni-bucket-2025"
-GCS_CREDENTIALS = r"C:\Users\eprot\OneDrive - Hochschule Düsseldorf\Dokumente\Uni\6. Semester (NO)\CV and DL\buoyant-airport-451611-d4-0e7f2929f9e6.json"
 
-# Ensure Google Cloud credentials
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = GCS_CREDENTIALS
+# Split into parts of max 2m 57s (HeyGen audio limit)
+MAX_LENGTH_S = 177
+PART_PATTERN = "temp_part%d.mp4"  # temp_part1.mp4, temp_part2.mp4, ...
+UPLOAD_WORKERS = 3
+UPLOADED_PARTS_FILE = "./data/uploaded_parts.json"  # Names and URLs of the uploaded parts, written on success
 
-# Convert MP3 to WAV in memory (without saving)
-print("🔄 Converting MP3 to WAV in memory...")
-audio = AudioSegment.from_mp3(MP3_FILE)
+def upload_part(store, part_path):
+    """Uploads one part to object storage and deletes the local file."""
+    blob_name = os.path.basename(part_path)
+    url = store.upload_file(part_path, blob_name, content_type="audio/mp4")
+    print(f"✅ Uploaded: {url}")
 
-# Split into 3 parts (each max 2m 57s)
-MAX_LENGTH_MS = 177 * 1000  # 2 minutes 57 seconds in milliseconds
-num_parts = math.ceil(len(audio) / MAX_LENGTH_MS)
-split_mp4_files = []
+    # Delete local MP4 file after upload
+    os.remove(part_path)
+    return {"name": blob_name, "url": url}
 
-for i in range(num_parts):
-    start_time = i * MAX_LENGTH_MS
-    end_time = min((i + 1) * MAX_LENGTH_MS, len(audio))
-    split_audio = audio[start_time:end_time]
+def write_parts_list(parts, path=UPLOADED_PARTS_FILE):
+    """Records the uploaded parts, replacing the list of an earlier run in one step."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(parts, f, indent=4)
+    os.replace(temp_path, path)
 
-    # Save temporary WAV file
-    temp_wav = f"temp_part{i+1}.wav"
-    split_audio.export(temp_wav, format="wav")
+def split_and_upload(mp3_file=MP3_FILE, output_dir=".", max_workers=UPLOAD_WORKERS):
+    """Splits the audio into AAC/MP4 parts in one streaming FFmpeg pass and uploads each part as it appears.
 
-    # Convert to MP4 (audio-only)
-    temp_mp4 = f"temp_part{i+1}.mp4"
-    ffmpeg_mp4_command = f'ffmpeg -i "{temp_wav}" -c:a aac -b:a 192k -vn "{temp_mp4}" -y'
-    subprocess.run(ffmpeg_mp4_command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    FFmpeg's segment muxer writes the parts directly, so memory use does not grow with the audio length.
+    """
+    if not os.path.exists(mp3_file):
+        print(f"❌ Audio file {mp3_file} not found!")
+        return []
 
-    # Delete temp WAV file
-    os.remove(temp_wav)
+    args = [
+        "-v", "error", "-y",
+        "-i", mp3_file,
+        "-vn", "-c:a", "aac", "-b:a", "192k",
+        "-f", "segment",
+        "-segment_time", str(MAX_LENGTH_S),
+        "-segment_format", "mp4",
+        "-segment_start_number", "1",
+        "-reset_timestamps", "1",
+        # Each finished part's file name is printed on stdout as soon as it is closed
+        "-segment_list", "pipe:1", "-segment_list_type", "flat",
+        os.path.join(output_dir, PART_PATTERN)
+    ]
 
-    # Upload MP4 to Google Cloud Storage
-    print(f"📤 Uploading {temp_mp4} to Google Cloud Storage...")
-    storage_client = storage.Client()
-    bucket = storage_client.bucket(GCS_BUCKET_NAME)
-    blob = bucket.blob(temp_mp4)
-    blob.upload_from_filename(temp_mp4)
+    print(f"🔄 Splitting {mp3_file} into {MAX_LENGTH_S}s parts...")
+    store = get_storage()
+    process = FFmpegProcess(args, label="split audio", stdout=subprocess.PIPE)
 
-    print(f"✅ Uploaded: gs://{GCS_BUCKET_NAME}/{temp_mp4}")
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        uploads = [
+            pool.submit(upload_part, store, os.path.join(output_dir, line.decode("utf-8").strip()))
+            for line in process.stdout if line.strip()
+        ]
+        result = process.wait()
+        uploaded = [upload.result() for upload in uploads]
 
-    # Delete local MP4 file after upload
-    os.remove(temp_mp4)
+    if not result.ok:
+        print(f"❌ FFmpeg error:\n{result.stderr}")
+        return []
+
+    write_parts_list(uploaded)
+    return uploaded
 
-print("🎉 All MP4 files processed, uploaded to cloud, and deleted locally!")
+if __name__ == "__main__":
+    # Optional argument: the audio file to split (default: MP3_FILE)
+    if split_and_upload(sys.argv[1] if len(sys.argv) > 1 else MP3_FILE):
+        print("🎉 All MP4 files processed, uploaded to cloud, and deleted locally!")
+    else:
+        sys.exit(1)